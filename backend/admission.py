@@ -0,0 +1,93 @@
+"""
+Bounded inference concurrency.
+
+Vision inference runs on a dedicated, size-limited thread pool instead of
+the default threadpool FastAPI uses for plain `def` endpoints, which stays
+free as the lane for lightweight endpoints (/api/status, /api/weather, ...).
+Each vision endpoint also has its own concurrency limit; a request over the
+limit gets an immediate ServerBusy (HTTP 503) instead of queueing behind
+work the CPU can't keep up with.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from telemetry import BUSY_REJECTIONS
+
+# Threads running vision inference, shared by all endpoints
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", str(min(8, os.cpu_count() or 4))))
+# Requests in flight per endpoint before answering 503
+ENDPOINT_CONCURRENCY = {
+    "analyze_face": int(os.getenv("CONCURRENCY_ANALYZE_FACE", str(INFERENCE_THREADS))),
+    "face_auth": int(os.getenv("CONCURRENCY_FACE_AUTH", "2")),
+    "exercise": int(os.getenv("CONCURRENCY_EXERCISE", str(INFERENCE_THREADS))),
+    "analyze": int(os.getenv("CONCURRENCY_ANALYZE", str(INFERENCE_THREADS))),
+}
+# How long a request may wait for a free slot before it is turned away (0 = never waits)
+ADMISSION_WAIT_S = float(os.getenv("ADMISSION_WAIT_S", "0"))
+# Seconds clients are told to wait before retrying a busy endpoint
+BUSY_RETRY_AFTER_S = int(os.getenv("BUSY_RETRY_AFTER_S", "1"))
+
+
+class ServerBusy(Exception):
+    """Raised when an endpoint is at its concurrency limit."""
+
+    def __init__(self, endpoint):
+        super().__init__(f"{endpoint} is busy")
+        self.endpoint = endpoint
+
+
+class InferenceExecutor:
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or INFERENCE_THREADS
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def submit(self, fn, *args, **kwargs):
+        """Runs `fn` on the executor without waiting for it (fire and forget)."""
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class EndpointLimiter:
+    def __init__(self, name, executor, limit=None, wait=None):
+        self.name = name
+        self.executor = executor
+        self.limit = ENDPOINT_CONCURRENCY.get(name, executor.max_workers) if limit is None else limit
+        self.wait = ADMISSION_WAIT_S if wait is None else wait
+        self.in_flight = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(self.limit)
+
+    async def _acquire(self):
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return
+        if self.wait > 0:
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.wait)
+                return
+            except asyncio.TimeoutError:
+                pass
+        self.rejected += 1
+        BUSY_REJECTIONS.inc(label=self.name)
+        raise ServerBusy(self.name)
+
+    async def run(self, fn, *args, **kwargs):
+        """Runs blocking `fn` on the inference executor, or raises ServerBusy."""
+        await self._acquire()
+        self.in_flight += 1
+        try:
+            return await self.executor.run(fn, *args, **kwargs)
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def status(self):
+        return {"in_flight": self.in_flight, "limit": self.limit, "rejected": self.rejected}
@@ -0,0 +1,72 @@
+"""
+Per-frame analysis on top of model outputs.
+
+Turns face landmarks into the face state of a SessionState. Inference
+happens elsewhere, so the HTTP handlers and the offline batch analyzer share
+exactly the same scoring (exercise counting lives in exercise.py).
+"""
+import time
+
+from classifier import classify, STATE_DETAILS
+from face_metrics import compute_metrics, NOSE_TIP
+from telemetry import stage_timer
+
+HEAD_SHAKE_RANGE = 0.08  # Increased threshold for less sensitivity
+
+
+def score_face(points, session_state, now=None):
+    """
+    Face state for one (478, 3) landmark array, updating the session's
+    head-movement window and state classifier. `now` (seconds, monotonic
+    clock or recording time) defaults to time.monotonic().
+    """
+    now = time.monotonic() if now is None else now
+
+    # --- Head Movement Tracking ---
+    # Use nose tip (landmark 1) for movement tracking
+    nose_tip = points[NOSE_TIP]
+    history = session_state.history  # Ring buffer, oldest sample drops off
+    history.append((float(nose_tip[0]), float(nose_tip[1]), now))
+
+    # Detect Head Shaking (Horizontal movement)
+    head_shaking = False
+    if len(history) >= 3:
+        # Calculate horizontal variance
+        x_coords = [p[0] for p in history]
+        x_range = max(x_coords) - min(x_coords)
+        # If movement is mostly horizontal and significant
+        if x_range > HEAD_SHAKE_RANGE:
+            head_shaking = True
+
+    # EAR, MAR (height / width) and Stress Heuristics (brow distance / face width),
+    # all from one gather-and-norm over the landmark array
+    with stage_timer("metrics"):
+        avg_ear, mar, norm_brow_dist = compute_metrics(points)
+
+    # Smoothed, hysteresis-banded state with a minimum dwell time, so a single
+    # noisy frame doesn't flip it; raw_state is this frame alone
+    classifier = session_state.classifier
+    state, state_changed = classifier.update(avg_ear, mar, norm_brow_dist, head_shaking, now=now)
+
+    return {
+        "detected": True,
+        "state": state,
+        "details": STATE_DETAILS[state],
+        "raw_state": classify(avg_ear, mar, norm_brow_dist, head_shaking),
+        "state_changed": state_changed,
+        "state_since_s": round(now - classifier.state_since, 3),
+        "head_shaking": head_shaking,
+        "metrics": {
+            "ear": float(avg_ear),
+            "mar": float(mar),
+            "brow": float(norm_brow_dist)
+        }
+    }
+
+
+def no_face(session_state):
+    """Resets the face tracking state of a session whose frame has no face."""
+    session_state.history.clear()  # Clear history when no face is found
+    state_changed = session_state.classifier.state is not None
+    session_state.classifier.reset()
+    return {"detected": False, "state": "No Face", "details": "No face detected", "state_changed": state_changed}
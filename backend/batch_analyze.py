@@ -0,0 +1,276 @@
+"""
+Offline batch analysis of recorded webcam sessions.
+
+Streams a video file or a directory of frames through the same face-state,
+phone and squat pipeline the HTTP endpoints use, without HTTP. Frames are
+read lazily by a generator, model inference runs in a pool of worker
+processes, and the stateful scoring (head movement, state classifier, squat
+stage) runs in frame order in the main process. Per-frame results are
+written in chunks to CSV or Parquet.
+
+Re-scoring after a threshold change in classifier.py (or STATE_EMA_TAU_S /
+STATE_MIN_DWELL_S) is just a re-run.
+
+Usage (from backend/):
+    python batch_analyze.py recordings/session1.mp4 -o session1.csv
+    python batch_analyze.py recordings/frames/ -o session1.parquet --workers 4 --fps 10
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import time
+from collections import deque
+
+import cv2
+
+from analysis import score_face, no_face
+from exercise import extract_pose, POSE_IMGSZ
+from face_metrics import landmarks_to_array
+from frames import Frame, decode_frame
+from phone_cadence import PHONE_DETECT_EVERY_N, result_has_phone
+from sessions import SessionState
+
+FACE_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "face_landmarker.task")
+POSE_WEIGHTS = "yolov8n-pose.pt"
+OBJECT_WEIGHTS = "yolov8n.pt"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+COLUMNS = ["frame", "timestamp_s", "detected", "ear", "mar", "brow", "head_shaking",
+           "state", "raw_state", "using_phone", "squat_count", "stage"]
+
+
+# --- Reading ---
+
+def read_frames(source, max_side=0, step=1, fps=None):
+    """
+    Yields (index, timestamp_s, bgr) for every `step`-th frame of a video file
+    or of a directory of images (sorted by name, timed at `fps`, default 1).
+    """
+    if os.path.isdir(source):
+        names = sorted(name for name in os.listdir(source) if name.lower().endswith(IMAGE_EXTENSIONS))
+        rate = fps or 1.0
+        for index in range(0, len(names), step):
+            with open(os.path.join(source, names[index]), "rb") as f:
+                data = f.read()
+            try:
+                bgr = decode_frame(data, max_side)
+            except ValueError:
+                continue  # Unreadable file, skip it
+            yield index, index / rate, bgr
+        return
+
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise SystemExit(f"Could not open {source}")
+    rate = fps or capture.get(cv2.CAP_PROP_FPS) or 30.0
+    index = 0
+    try:
+        while True:
+            # grab() skips decoding frames we don't keep
+            if not capture.grab():
+                break
+            if index % step == 0:
+                ok, bgr = capture.retrieve()
+                if not ok:
+                    break
+                if max_side and max(bgr.shape[:2]) > max_side:
+                    scale = max_side / max(bgr.shape[:2])
+                    bgr = cv2.resize(bgr, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                yield index, index / rate, bgr
+            index += 1
+    finally:
+        capture.release()
+
+
+# --- Inference (worker side) ---
+_face_detector = None
+_pose_model = None
+_object_model = None
+
+
+def _init_worker(face_model_path, pose_weights, object_weights):
+    global _face_detector, _pose_model, _object_model
+    from landmarker import create_face_landmarker
+    from models import load_yolo
+
+    _face_detector = create_face_landmarker(face_model_path)
+    _pose_model = load_yolo(pose_weights, "pose")
+    _object_model = load_yolo(object_weights, "detect")
+
+
+def _infer(job):
+    """Model outputs for one frame: (index, timestamp_s, landmarks or None, phone or None, pose or None)."""
+    from landmarker import to_mp_image
+
+    index, timestamp, bgr, run_phone = job
+    frame = Frame(bgr)
+    faces = _face_detector.detect(to_mp_image(frame)).face_landmarks
+    landmarks = landmarks_to_array(faces[0]) if faces else None
+    # Lower confidence to 0.4 to catch partial phones, as the live endpoints do
+    phone = result_has_phone(_object_model(bgr, verbose=False, conf=0.4)[0]) if run_phone else None
+    pose = extract_pose(_pose_model(bgr, verbose=False, imgsz=POSE_IMGSZ)[0], bgr.shape)
+    return index, timestamp, landmarks, phone, pose
+
+
+# --- Output ---
+
+class ChunkedWriter:
+    """Buffers rows and writes them `chunk_size` at a time to CSV or Parquet."""
+
+    def __init__(self, path, chunk_size=1000, columns=COLUMNS):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.columns = columns
+        self.rows = []
+        self.written = 0
+        self.parquet = path.lower().endswith(".parquet")
+        self._file = None
+        self._writer = None
+        if self.parquet:
+            try:
+                import pyarrow  # noqa: F401 - optional dependency, only needed for .parquet output
+            except ImportError:
+                raise SystemExit("Parquet output needs pyarrow (pip install pyarrow), or write .csv instead")
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.parquet:
+            self._write_parquet()
+        else:
+            if self._writer is None:
+                self._file = open(self.path, "w", newline="")
+                self._writer = csv.DictWriter(self._file, fieldnames=self.columns)
+                self._writer.writeheader()
+            self._writer.writerows(self.rows)
+            self._file.flush()
+        self.written += len(self.rows)
+        self.rows = []
+
+    def _write_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            # Fixed schema, so chunks without a face (all-null metrics) still line up
+            types = {"frame": pa.int64(), "timestamp_s": pa.float64(), "ear": pa.float32(),
+                     "mar": pa.float32(), "brow": pa.float32(), "squat_count": pa.int32(),
+                     "detected": pa.bool_(), "head_shaking": pa.bool_(), "using_phone": pa.bool_()}
+            schema = pa.schema([(column, types.get(column, pa.string())) for column in self.columns])
+            self._writer = pq.ParquetWriter(self.path, schema)
+        columns = {column: [row[column] for row in self.rows] for column in self.columns}
+        # One row group per chunk
+        self._writer.write_table(pa.Table.from_pydict(columns, schema=self._writer.schema))
+
+    def close(self):
+        self.flush()
+        if self._writer is not None and self.parquet:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+
+# --- Pipeline ---
+
+def score_frame(session_state, index, timestamp, landmarks, phone, pose, last_phone):
+    """Stateful scoring of one frame's model outputs, in frame order."""
+    face = score_face(landmarks, session_state, now=timestamp) if landmarks is not None else no_face(session_state)
+    session_state.exercise.update(pose, now=timestamp)
+    exercise = session_state.exercise.summary()
+    metrics = face.get("metrics", {})
+    return {
+        "frame": index,
+        "timestamp_s": round(timestamp, 3),
+        "detected": face["detected"],
+        "ear": metrics.get("ear"),
+        "mar": metrics.get("mar"),
+        "brow": metrics.get("brow"),
+        "head_shaking": face.get("head_shaking"),
+        "state": face["state"],
+        "raw_state": face.get("raw_state"),
+        "using_phone": last_phone if phone is None else phone,
+        "squat_count": exercise["count"],
+        "stage": exercise["stage"],
+    }
+
+
+def _bounded_imap(pool, jobs, window):
+    """
+    Ordered results of `_infer` over `jobs` with at most `window` frames in
+    flight. (Pool.imap reads its whole input up front, which for a long
+    recording means every decoded frame in memory at once.)
+    """
+    pending = deque()
+    for job in jobs:
+        pending.append(pool.apply_async(_infer, (job,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def analyze_recording(source, output, workers=0, chunk_size=1000, max_side=640, step=1, fps=None,
+                      phone_every=None, face_model_path=FACE_MODEL_PATH,
+                      pose_weights=POSE_WEIGHTS, object_weights=OBJECT_WEIGHTS):
+    """Analyzes every frame of `source` and writes one row per frame to `output`. Returns the row count."""
+    phone_every = phone_every or PHONE_DETECT_EVERY_N
+    # The phone detector runs on a fixed cadence; its last result is carried forward
+    jobs = ((index, timestamp, bgr, n % phone_every == 0)
+            for n, (index, timestamp, bgr) in enumerate(read_frames(source, max_side, step, fps)))
+
+    initargs = (face_model_path, pose_weights, object_weights)
+    pool = None
+    if workers > 0:
+        pool = multiprocessing.get_context("spawn").Pool(workers, initializer=_init_worker, initargs=initargs)
+        results = _bounded_imap(pool, jobs, window=workers * 4)
+    else:
+        _init_worker(*initargs)
+        results = map(_infer, jobs)
+
+    session_state = SessionState()
+    writer = ChunkedWriter(output, chunk_size)
+    last_phone = False
+    count = 0
+    start = time.perf_counter()
+    try:
+        for index, timestamp, landmarks, phone, pose in results:
+            row = score_frame(session_state, index, timestamp, landmarks, phone, pose, last_phone)
+            last_phone = row["using_phone"]
+            writer.write(row)
+            count += 1
+            if count % 500 == 0:
+                print(f"{count} frames ({count / (time.perf_counter() - start):.1f} fps)")
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.terminate()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score a recorded session offline")
+    parser.add_argument("source", help="Video file or directory of frames")
+    parser.add_argument("-o", "--output", required=True, help="Output .csv or .parquet file")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Inference worker processes (0 = run in this process)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Rows buffered per write")
+    parser.add_argument("--max-side", type=int, default=640, help="Downscale frames to this longest side (0 = full size)")
+    parser.add_argument("--step", type=int, default=1, help="Analyze every N-th frame")
+    parser.add_argument("--fps", type=float, default=None, help="Frame rate for timestamps (default: video rate, 1 for directories)")
+    parser.add_argument("--phone-every", type=int, default=None, help="Run the phone detector every N analyzed frames")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = analyze_recording(args.source, args.output, args.workers, args.chunk_size, args.max_side,
+                              args.step, args.fps, args.phone_every)
+    print(f"Wrote {count} rows to {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Micro-batching for the YOLO models.
+
+Concurrent requests each submit one frame; a worker thread collects the frames
+that arrive within a small time window and runs them as one batched
+ultralytics call, then hands every caller its own result.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Collection window in milliseconds (0 disables batching: frames run inline)
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "10"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+
+
+class BatchWorker:
+    def __init__(self, run_batch, max_batch=None, window_ms=None, name="batch-worker"):
+        """`run_batch(frames) -> results` must return one result per input frame, in order."""
+        self.run_batch = run_batch
+        self.max_batch = max(1, max_batch or BATCH_MAX_SIZE)
+        self.window = (BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000.0
+        self.name = name
+        self.queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, frame):
+        """Blocks until the batch containing `frame` has run and returns its result."""
+        if self.window <= 0:
+            return self.run_batch([frame])[0]
+
+        self._ensure_started()
+        future = Future()
+        self.queue.put((frame, future))
+        return future.result()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            frames = [frame for frame, _ in batch]
+            try:
+                results = self.run_batch(frames)
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
@@ -0,0 +1,235 @@
+"""
+Benchmark for the vision endpoints.
+
+Replays a directory of recorded JPEG frames through analyze_face, face_auth
+and exercise, in-process (calling the server's endpoint functions directly)
+and/or over HTTP against a running backend. Reports per-stage timings
+(decode, color conversion, landmarker, YOLO, metrics) and throughput at
+several concurrency levels, and writes everything as JSON so runs can be
+compared.
+
+Usage (from backend/):
+    python benchmark.py --frames ../recordings/session1 --mode inprocess
+    python benchmark.py --frames ../recordings/session1 --mode http --url http://127.0.0.1:5001/api
+    python benchmark.py --frames ... --concurrency 1,4,8 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ENDPOINTS = ["analyze_face", "face_auth", "exercise"]
+
+
+def load_frames(directory, limit=0):
+    """Encoded bytes of every .jpg/.jpeg in `directory`, in name order."""
+    names = sorted(name for name in os.listdir(directory) if name.lower().endswith((".jpg", ".jpeg")))
+    if limit:
+        names = names[:limit]
+    frames = []
+    for name in names:
+        with open(os.path.join(directory, name), "rb") as f:
+            frames.append(f.read())
+    if not frames:
+        raise SystemExit(f"No JPEG frames found in {directory}")
+    return frames
+
+
+def summarize(durations, wall_time=None):
+    """Latency stats (milliseconds) for a list of durations in seconds."""
+    ms = np.asarray(durations, dtype=np.float64) * 1000
+    stats = {
+        "n": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+    if wall_time:
+        stats["throughput_fps"] = round(ms.size / wall_time, 2)
+    return stats
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def run_concurrent(call, frames, concurrency, repeat=1):
+    """
+    Sends every frame `repeat` times through `call(worker, data)`, split
+    across `concurrency` workers that each send their frames one after
+    another (like one webcam client each). `call` returns "ok", "busy" or
+    "error". Returns (latencies, wall_time, outcome counts).
+    """
+    jobs = frames * repeat
+
+    def worker_loop(worker):
+        results = []
+        for data in jobs[worker::concurrency]:
+            start = time.perf_counter()
+            outcome = call(worker, data)
+            results.append((time.perf_counter() - start, outcome))
+        return results
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        per_worker = list(pool.map(worker_loop, range(concurrency)))
+    wall_time = time.perf_counter() - start
+
+    latencies = [latency for results in per_worker for latency, _ in results]
+    outcomes = {"ok": 0, "busy": 0, "error": 0}
+    for results in per_worker:
+        for _, outcome in results:
+            outcomes[outcome] += 1
+    return latencies, wall_time, outcomes
+
+
+# --- In-process ---
+
+def bench_stages(server, frames, max_side):
+    """Times each pipeline stage separately on every frame."""
+    from frames import Frame
+    from face_metrics import compute_metrics
+
+    stages = {name: [] for name in ["decode", "color_rgb", "color_gray", "landmarker", "metrics", "yolo_pose", "yolo_phone"]}
+    # Stage times should be model time: a lone caller would otherwise wait out
+    # the whole batching window on every frame
+    windows = server.pose_batcher.window, server.object_batcher.window
+    server.pose_batcher.window = server.object_batcher.window = 0
+    try:
+        for data in frames:
+            frame, t = timed(Frame.decode, data, max_side)
+            stages["decode"].append(t)
+            _, t = timed(lambda: frame.rgb)
+            stages["color_rgb"].append(t)
+            _, t = timed(lambda: frame.gray)
+            stages["color_gray"].append(t)
+            faces, t = timed(server.detect_faces, frame)
+            stages["landmarker"].append(t)
+            if faces:
+                _, t = timed(compute_metrics, faces[0])
+                stages["metrics"].append(t)
+            _, t = timed(server.detect_pose, frame)
+            stages["yolo_pose"].append(t)
+            _, t = timed(server.detect_phone, frame)
+            stages["yolo_phone"].append(t)
+    finally:
+        server.pose_batcher.window, server.object_batcher.window = windows
+    return {name: summarize(durations) for name, durations in stages.items() if durations}
+
+
+def inprocess_call(server, endpoint, run_id):
+    handler = {
+        "analyze_face": server.analyze_image,
+        "face_auth": server.authorize_face,
+        "exercise": server.exercise_frame,
+    }[endpoint]
+
+    def call(worker, data):
+        # One session per worker, like one client per webcam
+        result = handler(data, server.sessions.get(f"bench-{run_id}-{endpoint}-{worker}"))
+        return "error" if "error" in result or result.get("state") == "Error" else "ok"
+    return call
+
+
+def bench_inprocess(frames, concurrency_levels, repeat):
+    import server
+    from frames import FRAME_MAX_SIDE
+
+    # Load and warm every model up front so the first frames aren't penalized
+    for lazy in (server.face_detector, server.pose_model, server.object_model):
+        lazy.get()
+
+    results = {"stages": bench_stages(server, frames, FRAME_MAX_SIDE["analyze_face"]), "endpoints": {}}
+    for endpoint in ENDPOINTS:
+        results["endpoints"][endpoint] = {}
+        for concurrency in concurrency_levels:
+            call = inprocess_call(server, endpoint, concurrency)
+            latencies, wall, outcomes = run_concurrent(call, frames, concurrency, repeat)
+            results["endpoints"][endpoint][str(concurrency)] = {**summarize(latencies, wall), **outcomes}
+            print(f"in-process {endpoint:<13} c={concurrency:<3} {results['endpoints'][endpoint][str(concurrency)]}")
+    if server.inference_pool:
+        server.inference_pool.shutdown()
+    return results
+
+
+# --- HTTP ---
+
+def bench_http(frames, concurrency_levels, repeat, url):
+    import httpx  # Installed with openai
+
+    paths = {"analyze_face": "/analyze_face", "face_auth": "/face_auth", "exercise": "/exercise"}
+    results = {"endpoints": {}}
+    for endpoint in ENDPOINTS:
+        results["endpoints"][endpoint] = {}
+        for concurrency in concurrency_levels:
+            clients = [httpx.Client(timeout=30) for _ in range(concurrency)]
+
+            def call(worker, data, endpoint=endpoint, concurrency=concurrency):
+                response = clients[worker].post(
+                    url + paths[endpoint], content=data,
+                    headers={"Content-Type": "application/octet-stream",
+                             "X-Session-Id": f"bench-{concurrency}-{endpoint}-{worker}"})
+                if response.status_code == 503:
+                    return "busy"  # Turned away by the endpoint's concurrency limit
+                return "ok" if response.status_code == 200 else "error"
+
+            latencies, wall, outcomes = run_concurrent(call, frames, concurrency, repeat)
+            results["endpoints"][endpoint][str(concurrency)] = {**summarize(latencies, wall), **outcomes}
+            print(f"http       {endpoint:<13} c={concurrency:<3} {results['endpoints'][endpoint][str(concurrency)]}")
+            for client in clients:
+                client.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vision endpoints on recorded JPEG frames")
+    parser.add_argument("--frames", required=True, help="Directory of recorded .jpg frames")
+    parser.add_argument("--mode", choices=["inprocess", "http", "both"], default="inprocess")
+    parser.add_argument("--url", default="http://127.0.0.1:5001/api", help="Backend API base URL (http mode)")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--repeat", type=int, default=1, help="Times each frame is replayed per level")
+    parser.add_argument("--limit", type=int, default=0, help="Use at most this many frames (0 = all)")
+    parser.add_argument("--output", default="benchmark.json", help="JSON results file")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.limit)
+    concurrency_levels = [int(level) for level in args.concurrency.split(",") if level]
+    print(f"Loaded {len(frames)} frames from {args.frames}")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "frames": len(frames),
+            "frames_dir": os.path.abspath(args.frames),
+            "concurrency": concurrency_levels,
+            "repeat": args.repeat,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            # Settings that change performance, so runs are compared like for like
+            "env": {key: value for key, value in os.environ.items()
+                    if key.startswith(("MAX_SIDE_", "BATCH_", "INFERENCE_", "CONCURRENCY_", "ROI_",
+                                       "FACE_RUNNING_MODE", "YOLO_", "PHONE_"))},
+        },
+    }
+    if args.mode in ("inprocess", "both"):
+        report["inprocess"] = bench_inprocess(frames, concurrency_levels, args.repeat)
+    if args.mode in ("http", "both"):
+        report["http"] = bench_http(frames, concurrency_levels, args.repeat, args.url.rstrip("/"))
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Wellness chat over the OpenAI completions API.
+
+One shared AsyncOpenAI client (and its pooled HTTP connections) serves every
+request without blocking a threadpool worker. Replies can be streamed token
+by token, and answers to repeated questions come from an LRU + TTL cache
+keyed on the normalized query. OPENAI_BASE_URL points the client at any
+server speaking the same API, e.g. a local stub in tests.
+"""
+import os
+import re
+import time
+from collections import OrderedDict
+
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+OPENAI_TIMEOUT_S = float(os.getenv("OPENAI_TIMEOUT_S", "30"))
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "256"))  # 0 disables the cache
+CHAT_CACHE_TTL_S = float(os.getenv("CHAT_CACHE_TTL_S", "3600"))
+
+SYSTEM_PROMPT = """You are an AI Wellness Assistant integrated into a browser.
+        Your goal is to help users with:
+        - Wellness and fitness tips (especially squats and posture)
+        - Reducing screen time and eye strain
+        - Mental health advice (stress, anxiety)
+        - General productivity
+
+        Be concise, friendly, and motivating. Use best practices for health advice."""
+
+
+def load_async_openai_client():
+    from openai import AsyncOpenAI
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY not configured.")
+    return AsyncOpenAI(api_key=api_key, base_url=OPENAI_BASE_URL, timeout=OPENAI_TIMEOUT_S)
+
+
+def normalize_query(query):
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip(" ?!.")
+
+
+class ResponseCache:
+    def __init__(self, max_size=None, ttl=None):
+        self.max_size = CHAT_CACHE_SIZE if max_size is None else max_size
+        self.ttl = CHAT_CACHE_TTL_S if ttl is None else ttl
+        self._entries = OrderedDict()  # key -> (expires_at, response), oldest first
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def put(self, key, response):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _messages(message):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": message},
+    ]
+
+
+class ChatService:
+    def __init__(self, client_source, cache=None, model=None):
+        # client_source: LazyModel creating the AsyncOpenAI client on first use
+        self.client_source = client_source
+        self.cache = cache or ResponseCache()
+        self.model = model or OPENAI_MODEL
+
+    async def reply(self, query):
+        """Full reply text and whether it came from the cache."""
+        message = normalize_query(query)
+        cached = self.cache.get(message)
+        if cached is not None:
+            return cached, True
+
+        client = self.client_source.get()
+        completion = await client.chat.completions.create(model=self.model, messages=_messages(message))
+        response = completion.choices[0].message.content or ""
+        if response:  # An empty completion would be served from cache until the TTL runs out
+            self.cache.put(message, response)
+        return response, False
+
+    async def stream(self, query):
+        """Yields reply text chunks as they arrive; a cached reply is one chunk."""
+        message = normalize_query(query)
+        cached = self.cache.get(message)
+        if cached is not None:
+            yield cached
+            return
+
+        client = self.client_source.get()
+        stream = await client.chat.completions.create(model=self.model, messages=_messages(message), stream=True)
+        parts = []
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                parts.append(text)
+                yield text
+        # Only complete, non-empty replies are cached
+        if parts:
+            self.cache.put(message, "".join(parts))
@@ -0,0 +1,97 @@
+"""
+Temporal face-state classifier.
+
+Classifying every frame on its own against fixed thresholds flickers between
+states. This classifier keeps O(1) state per session: exponential moving
+averages of EAR / MAR / brow distance (weighted by the time between frames,
+so smoothing is the same at any frame rate), hysteresis bands (a state is entered
+at one threshold and left at a looser one) and a minimum dwell time a new
+state must persist before it is reported.
+"""
+import math
+import os
+import time
+
+# Thresholds (Tunable): enter the state past ENTER, leave it only past EXIT
+EAR_THRESHOLD = 0.22       # Below this = Drowsy
+EAR_EXIT = 0.25
+MAR_THRESHOLD = 0.6        # Above this = Yawning
+MAR_EXIT = 0.5
+BROW_THRESHOLD = 0.21      # Below this = Headache (brow tension)
+BROW_EXIT = 0.23
+
+# EMA time constant in seconds (0 = no smoothing); a frame dt seconds after the
+# last one gets weight 1 - exp(-dt / tau)
+STATE_EMA_TAU_S = float(os.getenv("STATE_EMA_TAU_S", "0.5"))
+# Seconds a new state must persist before it is reported
+STATE_MIN_DWELL_S = float(os.getenv("STATE_MIN_DWELL_S", "0.8"))
+
+STATE_DETAILS = {
+    "Yawning": "Fatigue detected (Yawning)",
+    "Drowsy": "Fatigue detected (Drowsy)",
+    "Headache": "Head pain or tension detected",
+    "Focused": "User appears alert",
+}
+
+
+def classify(ear, mar, brow, head_shaking, current=None):
+    """
+    Face state for one set of metrics. Thresholds of the `current` state use
+    their exit band, so small oscillations around a threshold don't flip it.
+    """
+    if mar > (MAR_EXIT if current == "Yawning" else MAR_THRESHOLD):
+        return "Yawning"
+    if ear < (EAR_EXIT if current == "Drowsy" else EAR_THRESHOLD):
+        return "Drowsy"
+    if head_shaking or brow < (BROW_EXIT if current == "Headache" else BROW_THRESHOLD):
+        return "Headache"
+    return "Focused"
+
+
+class FaceStateClassifier:
+    def __init__(self, tau=None, min_dwell=None):
+        self.tau = STATE_EMA_TAU_S if tau is None else tau
+        self.min_dwell = STATE_MIN_DWELL_S if min_dwell is None else min_dwell
+        self.reset()
+
+    def reset(self):
+        self.ear = self.mar = self.brow = None  # EMAs
+        self.last_time = None
+        self.state = None
+        self.state_since = None
+        self.candidate = None
+        self.candidate_since = None
+
+    def _smooth(self, previous, value, alpha):
+        if previous is None:
+            return value
+        return previous + alpha * (value - previous)
+
+    def update(self, ear, mar, brow, head_shaking, now=None):
+        """Feeds one frame's metrics; returns (state, changed)."""
+        now = time.monotonic() if now is None else now
+        dt = 0.0 if self.last_time is None else max(now - self.last_time, 0.0)
+        alpha = 1.0 if self.tau <= 0 else 1.0 - math.exp(-dt / self.tau)
+        self.last_time = now
+        self.ear = self._smooth(self.ear, ear, alpha)
+        self.mar = self._smooth(self.mar, mar, alpha)
+        self.brow = self._smooth(self.brow, brow, alpha)
+
+        target = classify(self.ear, self.mar, self.brow, head_shaking, self.state)
+        if self.state is None:
+            # First frame of a face: report it right away
+            self.state, self.state_since = target, now
+            self.candidate = None
+            return self.state, True
+
+        if target == self.state:
+            self.candidate = None
+            return self.state, False
+
+        if target != self.candidate:
+            self.candidate, self.candidate_since = target, now
+        if now - self.candidate_since >= self.min_dwell:
+            self.state, self.state_since = target, now
+            self.candidate = None
+            return self.state, True
+        return self.state, False
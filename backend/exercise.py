@@ -0,0 +1,387 @@
+"""
+Exercise engine on top of the YOLO pose model.
+
+Pose results are reduced to one person's 17 COCO keypoints as a (17, 3)
+float32 array of x, y (in units of the frame's longest side, so both axes
+share one scale) and confidence; only that person's
+row is copied off the model output. Every enabled exercise in the registry
+(squat, neck rolls, shoulder shrugs, sit-to-stand) is a small state machine
+fed that same array, so one pose inference per frame serves them all.
+Keypoints are gated on confidence and measured in body-relative units
+(joint angles, a per-session standing thigh length, shoulder widths), so
+counts don't depend on the input resolution. When the last poses say the user is standing still and
+the scene hasn't changed, inference is skipped and the previous pose is
+reused.
+"""
+import os
+import time
+
+import numpy as np
+
+from phone_cadence import scene_thumbnail
+
+# YOLO input size for the pose model; normalized keypoints keep counts
+# stable at small sizes
+POSE_IMGSZ = int(os.getenv("POSE_IMGSZ", "320"))
+# Keypoints below this confidence are ignored
+KEYPOINT_MIN_CONF = float(os.getenv("KEYPOINT_MIN_CONF", "0.5"))
+
+# Side-on legs (ankles visible): knee angle (degrees) below which a squat is
+# down, above which it is up again
+SQUAT_DOWN_ANGLE = float(os.getenv("SQUAT_DOWN_ANGLE", "100"))
+SQUAT_UP_ANGLE = float(os.getenv("SQUAT_UP_ANGLE", "160"))
+# Front-on (the usual webcam view) or ankles hidden: hip height above the
+# knee as a fraction of the standing hip height. The 2D knee angle barely
+# changes when the thigh foreshortens toward the camera.
+SQUAT_DOWN_HIP_RATIO = 0.35
+SQUAT_UP_HIP_RATIO = 0.75
+# Shoulder width / torso length below which the body is seen side-on
+SIDE_ON_RATIO = 0.45
+# Sit-to-stand: seated / standing knee angle, or hip height ratio
+SEATED_ANGLE = 115
+STANDING_ANGLE = 155
+SEATED_HIP_RATIO = 0.3
+STANDING_HIP_RATIO = 0.8
+# Neck rolls (same sequence as neck.js): nose height above the shoulder line,
+# in shoulder widths. Tuned estimates: head down below 0.25, neutral above 0.4
+NECK_DOWN_RATIO = 0.25
+NECK_NEUTRAL_RATIO = 0.4
+NECK_STEPS = [("down", 5.0), ("neutral", 3.0), ("down", 5.0)]  # (position, hold seconds)
+# Longest gap between frames that still counts as holding (longer = paused or
+# lost frames); server frames arrive at the client's ~1 s polling rate
+NECK_MAX_GAP_S = float(os.getenv("NECK_MAX_GAP_S", "3"))
+# Shoulder shrugs: shoulder-to-ear distance shrinking by this fraction of the
+# relaxed distance is up, back within RELAX is down
+SHRUG_UP = 0.15
+SHRUG_RELAX = 0.05
+
+# Exercises evaluated by default (comma-separated registry names)
+ENABLED_EXERCISES = [name.strip() for name in os.getenv("ENABLED_EXERCISES", "squat,neck_rolls,shoulder_shrugs,sit_to_stand").split(",") if name.strip()]
+
+# Static-pose skipping: largest keypoint move (normalized) that counts as still,
+# scene change that forces inference, and the longest run of skipped frames
+STATIC_POSE_EPS = float(os.getenv("STATIC_POSE_EPS", "0.01"))
+STATIC_SCENE_THRESHOLD = float(os.getenv("STATIC_SCENE_THRESHOLD", "0.02"))
+STATIC_MAX_SKIP = int(os.getenv("STATIC_MAX_SKIP", "5"))
+
+# COCO keypoint indices, (left, right)
+NOSE = 0
+EARS = [3, 4]
+SHOULDERS = [5, 6]
+HIPS = [11, 12]
+KNEES = [13, 14]
+ANKLES = [15, 16]
+
+
+def extract_pose(result, frame_shape):
+    """
+    (17, 3) float32 array of x, y and confidence for the most confident
+    person in an ultralytics pose result, or None. x and y are both divided
+    by the frame's longest side: separate width/height scaling would stretch
+    one axis and change joint angles with the camera's aspect ratio.
+    """
+    if result is None or result.keypoints is None or len(result.keypoints) == 0:
+        return None
+    person = 0
+    if result.boxes is not None and len(result.boxes) > 1:
+        person = int(result.boxes.conf.argmax())
+    keypoints = result.keypoints.data[person].cpu().numpy().astype(np.float32)  # Only this person's rows
+    if keypoints.shape[1] == 2:  # Model without keypoint confidences
+        keypoints = np.concatenate([keypoints, np.ones((len(keypoints), 1), np.float32)], axis=1)
+    keypoints[:, :2] /= max(frame_shape[:2])
+    return keypoints
+
+
+def joint_angles(pose, a, b, c):
+    """Angles (degrees) at joints `b` between segments to `a` and `c`, for index lists."""
+    ba = pose[a, :2] - pose[b, :2]
+    bc = pose[c, :2] - pose[b, :2]
+    cos = np.sum(ba * bc, axis=-1) / (np.linalg.norm(ba, axis=-1) * np.linalg.norm(bc, axis=-1) + 1e-9)
+    return np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+
+def confident(pose, *joints, min_conf=None):
+    """Mask over the legs (or other index lists) whose joints all pass the confidence gate."""
+    min_conf = KEYPOINT_MIN_CONF if min_conf is None else min_conf
+    return np.all([pose[j, 2] >= min_conf for j in joints], axis=0)
+
+
+def side_on(pose):
+    """Whether the body faces sideways: shoulders narrow relative to the torso."""
+    if not (confident(pose, SHOULDERS).all() and confident(pose, HIPS).all()):
+        return False
+    width = np.linalg.norm(pose[SHOULDERS[0], :2] - pose[SHOULDERS[1], :2])
+    torso = np.linalg.norm(pose[SHOULDERS, :2].mean(axis=0) - pose[HIPS, :2].mean(axis=0))
+    return bool(torso > 0 and width / torso < SIDE_ON_RATIO)
+
+
+class LegPosture:
+    """
+    Per-session leg measurement shared by the squat and sit-to-stand counters.
+    Side-on with ankles visible: ("angle", mean knee angle). Otherwise
+    ("hip_ratio", hip height above the knees / standing hip height), where
+    the standing height is learned from this session's upright frames.
+    """
+
+    def __init__(self):
+        self.standing = None  # Hip height above the knees while upright (frame units)
+
+    def measure(self, pose):
+        """("angle", degrees), ("hip_ratio", ratio) or None for one pose."""
+        legs = confident(pose, HIPS, KNEES, ANKLES)
+        if legs.any() and side_on(pose):
+            return "angle", float(joint_angles(pose, HIPS, KNEES, ANKLES)[legs].mean())
+        legs = confident(pose, HIPS, KNEES)
+        if not legs.any():
+            return None
+        height = float((pose[KNEES, 1] - pose[HIPS, 1])[legs].mean())
+        if self.standing is None or height > self.standing:
+            self.standing = height  # Taller than the reference: standing (or closer to the camera)
+        elif height > self.standing * STANDING_HIP_RATIO:
+            # Upright: follow slow drift (stepping back from the camera)
+            self.standing += 0.1 * (height - self.standing)
+        if self.standing <= 0.01:
+            return None
+        return "hip_ratio", max(height, 0.0) / self.standing
+
+
+def shoulder_width(pose):
+    if not confident(pose, SHOULDERS).all():
+        return None
+    width = float(np.linalg.norm(pose[SHOULDERS[0], :2] - pose[SHOULDERS[1], :2]))
+    return width if width > 0.01 else None
+
+
+# --- Exercise registry ---
+EXERCISES = {}
+
+
+def register(name):
+    """Class decorator adding an exercise state machine to the registry."""
+    def add(cls):
+        cls.name = name
+        EXERCISES[name] = cls
+        return cls
+    return add
+
+
+class Exercise:
+    """State machine over normalized poses; subclasses implement update()."""
+    name = None
+
+    def __init__(self):
+        self.count = 0
+        self.stage = None
+
+    def update(self, pose, now):
+        raise NotImplementedError
+
+    def summary(self):
+        return {"count": self.count, "stage": self.stage}
+
+
+@register("squat")
+class Squat(Exercise):
+    def __init__(self):
+        super().__init__()
+        self.legs = LegPosture()
+        self.knee_angle = None
+
+    def update(self, pose, now):
+        posture = self.legs.measure(pose)
+        if posture is None:
+            return
+        kind, value = posture
+        if kind == "angle":
+            self.knee_angle = value
+            down, up = value < SQUAT_DOWN_ANGLE, value > SQUAT_UP_ANGLE
+        else:
+            # Front-on or ankles out of view: hip height relative to standing
+            self.knee_angle = None
+            down, up = value < SQUAT_DOWN_HIP_RATIO, value > SQUAT_UP_HIP_RATIO
+
+        if down:
+            self.stage = "down"
+        elif up and self.stage == "down":
+            self.stage = "up"
+            self.count += 1
+
+    def summary(self):
+        knee_angle = round(self.knee_angle, 1) if self.knee_angle is not None else None
+        return {"count": self.count, "stage": self.stage, "knee_angle": knee_angle}
+
+
+@register("sit_to_stand")
+class SitToStand(Exercise):
+    """
+    Front-on, the first stand-up teaches the standing hip height, so a
+    session that starts seated counts from its second rep.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.legs = LegPosture()
+
+    def update(self, pose, now):
+        posture = self.legs.measure(pose)
+        if posture is None:
+            return
+        kind, value = posture
+        if kind == "angle":
+            seated, standing = value < SEATED_ANGLE, value > STANDING_ANGLE
+        else:
+            seated, standing = value < SEATED_HIP_RATIO, value > STANDING_HIP_RATIO
+
+        if seated:
+            self.stage = "seated"
+        elif standing:
+            if self.stage == "seated":
+                self.count += 1
+            self.stage = "standing"
+
+
+@register("neck_rolls")
+class NeckRolls(Exercise):
+    """
+    neck.js' guided sequence on the pose: hold the head down, neutral, then
+    down again; each step's timer only runs while the position is held.
+    count is the number of completed sequences.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.step = 0
+        self.held = 0.0
+        self.last_time = None
+        self.ratio = None
+
+    def update(self, pose, now):
+        width = shoulder_width(pose)
+        if width is None or pose[NOSE, 2] < KEYPOINT_MIN_CONF:
+            self.last_time = None
+            return
+        self.ratio = (float(pose[SHOULDERS, 1].mean()) - float(pose[NOSE, 1])) / width
+        position, duration = NECK_STEPS[self.step]
+        held = self.ratio < NECK_DOWN_RATIO if position == "down" else self.ratio > NECK_NEUTRAL_RATIO
+        self.stage = position if held else "adjusting"
+
+        if held and self.last_time is not None:
+            delta = now - self.last_time
+            if delta <= NECK_MAX_GAP_S:  # Ignore gaps (paused or lost frames)
+                self.held += delta
+        self.last_time = now
+
+        if self.held >= duration:
+            self.step += 1
+            self.held = 0.0
+            if self.step == len(NECK_STEPS):
+                self.count += 1
+                self.step = 0
+
+    def summary(self):
+        position, duration = NECK_STEPS[self.step]
+        return {"count": self.count, "stage": self.stage, "step": self.step,
+                "target": position, "held_s": round(self.held, 2), "duration_s": duration}
+
+
+@register("shoulder_shrugs")
+class ShoulderShrugs(Exercise):
+    def __init__(self):
+        super().__init__()
+        self.relaxed = None  # Running relaxed shoulder-to-ear distance
+
+    def update(self, pose, now):
+        width = shoulder_width(pose)
+        if width is None:
+            return
+        # Ears when visible, else the nose
+        ears = confident(pose, EARS)
+        if ears.any():
+            head_y = float(pose[EARS, 1][ears].mean())
+        elif pose[NOSE, 2] >= KEYPOINT_MIN_CONF:
+            head_y = float(pose[NOSE, 1])
+        else:
+            return
+        distance = (float(pose[SHOULDERS, 1].mean()) - head_y) / width
+
+        if self.relaxed is None:
+            self.relaxed = distance
+        if distance < self.relaxed * (1 - SHRUG_UP):
+            self.stage = "up"
+        elif distance > self.relaxed * (1 - SHRUG_RELAX):
+            if self.stage == "up":
+                self.count += 1
+            self.stage = "down"
+            # Follow slow posture drift while relaxed
+            self.relaxed += 0.1 * (distance - self.relaxed)
+
+
+class ExerciseEngine:
+    def __init__(self, enabled=None):
+        self.exercises = {}
+        self.enable(enabled or ENABLED_EXERCISES)
+        self.pose = None         # Last normalized pose
+        self.static = False      # Last two poses (nearly) identical
+        self.skipped = 0         # Consecutive frames that reused the last pose
+        self._thumb = None
+
+    def enable(self, names):
+        """Evaluates exactly `names` from now on; already running exercises keep their state."""
+        unknown = [name for name in names if name not in EXERCISES]
+        if unknown:
+            raise ValueError(f"Unknown exercise: {', '.join(unknown)}")
+        self.exercises = {name: self.exercises.get(name) or EXERCISES[name]() for name in names}
+
+    def _can_skip(self, thumb):
+        if not self.static or self._thumb is None or self.skipped >= STATIC_MAX_SKIP:
+            return False
+        return float(np.mean(np.abs(thumb - self._thumb))) <= STATIC_SCENE_THRESHOLD
+
+    def process(self, frame, infer, now=None):
+        """
+        Updates every enabled exercise from a Frame. `infer(frame) -> pose or None`
+        is skipped while the user is static and the scene unchanged (the last
+        pose is reused, so hold timers keep running). Returns whether inference ran.
+        """
+        now = time.monotonic() if now is None else now
+        thumb = scene_thumbnail(frame)
+        if self._can_skip(thumb):
+            self.skipped += 1
+            self._feed(self.pose, now)
+            return False
+
+        self.update(infer(frame), now)
+        self._thumb = thumb
+        self.skipped = 0
+        return True
+
+    def update(self, pose, now=None):
+        """Feeds one normalized pose (or None) to every enabled exercise."""
+        if pose is not None and self.pose is not None:
+            both = (pose[:, 2] >= KEYPOINT_MIN_CONF) & (self.pose[:, 2] >= KEYPOINT_MIN_CONF)
+            moved = np.abs(pose[both, :2] - self.pose[both, :2]).max() if both.any() else np.inf
+            self.static = bool(moved < STATIC_POSE_EPS)
+        else:
+            self.static = False
+        self.pose = pose
+        self._feed(pose, time.monotonic() if now is None else now)
+
+    def _feed(self, pose, now):
+        if pose is None:
+            return
+        for exercise in self.exercises.values():
+            exercise.update(pose, now)
+
+    def summary(self, inferred=True):
+        exercises = {name: exercise.summary() for name, exercise in self.exercises.items()}
+        # Top-level count/stage stay the squat counter's, as before
+        squat = exercises.get("squat", {})
+        return {
+            "count": squat.get("count", 0),
+            "stage": squat.get("stage"),
+            "knee_angle": squat.get("knee_angle"),
+            "exercises": exercises,
+            "person_detected": self.pose is not None,
+            "inference_skipped": not inferred,
+            "message": "Processed"
+        }
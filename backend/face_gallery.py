@@ -0,0 +1,222 @@
+"""
+Enrolled-user face gallery for /api/face_auth.
+
+Each user is one geometry embedding computed from FaceLandmarker landmarks:
+log pairwise 3D distances between rigid facial points (eye corners, nose
+bridge, temples, jaw), measured in pixels and scale-normalized, so it
+ignores position, size, head tilt and the camera's aspect ratio (turning
+the head away only roughly, since MediaPipe's z is an estimate). Embeddings live in a memory-mapped float32 matrix on disk
+(embeddings.f32) with the user list in users.json, so every kiosk process
+sharing the directory sees the same gallery without loading it by hand.
+
+Matching scores every user at once with one matrix-vector product: the
+RMS difference between the incoming embedding and each enrolled row (how
+far, on average, the face's proportions are from the user's, as a log
+ratio). The best user matches if that distance is under
+FACE_MATCH_MAX_DISTANCE. The threshold is absolute, so it means the same
+with one enrolled user as with thousands. (Cosine similarity between these
+embeddings is close to 1 for almost any two faces, since every face shares
+the same overall shape.)
+
+Enrolling goes through the admin-only /api/face_auth/enroll (FACE_ENROLL_TOKEN).
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+FACE_GALLERY_DIR = os.getenv("FACE_GALLERY_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "face_gallery"))
+# RMS log-ratio distance under which a face matches an enrolled user. ~1 px of
+# landmark jitter puts the same face at 0.015-0.025; faces whose proportions
+# differ by ~10% land near 0.1. Tune per camera if needed.
+FACE_MATCH_MAX_DISTANCE = float(os.getenv("FACE_MATCH_MAX_DISTANCE", "0.04"))
+# How long a session reuses its last match before searching the gallery again
+FACE_MATCH_CACHE_S = float(os.getenv("FACE_MATCH_CACHE_S", "5"))
+
+# Rigid landmarks: eye corners, nose bridge and tip, forehead, temples,
+# cheekbones, jaw and chin (mouth and brows move with expressions)
+EMBED_LANDMARKS = [33, 133, 362, 263, 168, 6, 195, 1, 10, 127, 356, 234, 454,
+                   93, 323, 132, 361, 58, 288, 152]
+_I, _J = np.triu_indices(len(EMBED_LANDMARKS), k=1)
+EMBEDDING_DIM = len(_I)
+
+
+def face_embedding(points, frame_shape):
+    """
+    Geometry embedding (EMBEDDING_DIM float32) of one (478, 3) landmark array
+    from a frame of `frame_shape`. MediaPipe normalizes x by the width and y
+    by the height, so both are put back on one pixel scale first (z shares
+    x's scale); otherwise a tilted head stretches distances unevenly.
+    """
+    height, width = frame_shape[:2]
+    subset = np.asarray(points, dtype=np.float32)[EMBED_LANDMARKS] * np.array([width, height, width], np.float32)
+    distances = np.linalg.norm(subset[_I] - subset[_J], axis=-1)
+    # Scale-free: relative to the mean distance, in log space
+    return np.log(distances / distances.mean() + 1e-6).astype(np.float32)
+
+
+class FaceGallery:
+    def __init__(self, directory=None, dim=EMBEDDING_DIM):
+        self.directory = directory or FACE_GALLERY_DIR
+        self.dim = dim
+        self.matrix_path = os.path.join(self.directory, "embeddings.f32")
+        self.users_path = os.path.join(self.directory, "users.json")
+        self.users = []        # [{"user_id", "name", "samples"}], row order
+        self._row_of = {}      # user_id -> row
+        self._rows = None      # Memory-mapped (capacity, dim) float32 embeddings
+        self._index = None     # (N, dim) in-memory copy of the enrolled rows
+        self._sq_norms = None  # (N,) squared row norms for the distance expansion
+        self._loaded_mtime = None
+        self._lock = threading.Lock()
+        self.reload()
+
+    def __len__(self):
+        return len(self.users)
+
+    # --- Storage ---
+
+    def _open_rows(self, capacity):
+        self._rows = np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def reload(self):
+        """(Re)loads the gallery from disk if it changed since the last load."""
+        with self._lock:
+            try:
+                mtime = os.stat(self.users_path).st_mtime_ns
+            except FileNotFoundError:
+                return
+            if mtime == self._loaded_mtime:
+                return
+            with open(self.users_path) as f:
+                meta = json.load(f)
+            if meta["dim"] != self.dim:
+                raise ValueError(f"Gallery embeddings have {meta['dim']} dims, expected {self.dim}")
+            self.users = meta["users"]
+            self._row_of = {user["user_id"]: row for row, user in enumerate(self.users)}
+            self._open_rows(meta["capacity"])
+            self._loaded_mtime = mtime
+            self._rebuild_index()
+
+    def _save(self, capacity):
+        self._rows.flush()
+        tmp = self.users_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"dim": self.dim, "capacity": capacity, "users": self.users}, f)
+        os.replace(tmp, self.users_path)  # Readers never see a half-written list
+        self._loaded_mtime = os.stat(self.users_path).st_mtime_ns
+
+    def _ensure_capacity(self, size):
+        capacity = 0 if self._rows is None else self._rows.shape[0]
+        if size <= capacity:
+            return capacity
+        new_capacity = max(64, capacity * 2, size)
+        os.makedirs(self.directory, exist_ok=True)
+        if self._rows is not None:
+            self._rows.flush()
+            self._rows = None
+        with open(self.matrix_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self._open_rows(new_capacity)
+        return new_capacity
+
+    # --- Index ---
+
+    def _rebuild_index(self):
+        count = len(self.users)
+        self._index = np.array(self._rows[:count]) if count else np.zeros((0, self.dim), np.float32)
+        self._sq_norms = np.einsum("ij,ij->i", self._index, self._index)
+
+    def _distances(self, index, sq_norms, query):
+        # |row - query|^2 = |row|^2 - 2 row.query + |query|^2, one product for every row
+        squared = sq_norms - 2 * (index @ query) + query @ query
+        return np.sqrt(np.maximum(squared, 0) / self.dim)
+
+    # --- API ---
+
+    def enroll(self, user_id, embedding, name=None):
+        """
+        Adds one embedding sample for `user_id`. Repeated samples of the same
+        user are averaged into their row. Returns the user's record.
+        """
+        embedding = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            row = self._row_of.get(user_id)
+            if row is None:
+                capacity = self._ensure_capacity(len(self.users) + 1)
+                row = self._row_of[user_id] = len(self.users)
+                self.users.append({"user_id": user_id, "name": name or user_id, "samples": 0})
+                self._rows[row] = embedding
+            else:
+                capacity = self._rows.shape[0]
+            user = self.users[row]
+            if user["samples"]:
+                self._rows[row] += (embedding - self._rows[row]) / (user["samples"] + 1)
+            if name:
+                user["name"] = name
+            user["samples"] += 1
+            self._save(capacity)
+            self._rebuild_index()
+            return dict(user)
+
+    def match(self, embedding):
+        """
+        Closest enrolled user for an embedding: (user record or None, RMS distance).
+        One matrix-vector product over the whole gallery.
+        """
+        self.reload()
+        with self._lock:
+            if not self.users:
+                return None, float("inf")
+            distances = self._distances(self._index, self._sq_norms, np.asarray(embedding, dtype=np.float32))
+            best = int(np.argmin(distances))
+            return dict(self.users[best]), float(distances[best])
+
+    def distance(self, user_id, embedding):
+        """RMS distance of an embedding from one enrolled user (None if unknown)."""
+        with self._lock:
+            row = self._row_of.get(user_id)
+            if row is None:
+                return None
+            query = np.asarray(embedding, dtype=np.float32)
+            return float(self._distances(self._index[row:row + 1], self._sq_norms[row:row + 1], query)[0])
+
+    def identify(self, embedding, cache=None):
+        """
+        Matching enrolled user for an embedding: (user record or None, distance,
+        cached). With a session's MatchCache, a recent match is re-checked
+        against that one user before searching the whole gallery.
+        """
+        if cache is not None and cache.get() is not None:
+            user = cache.get()
+            distance = self.distance(user["user_id"], embedding)
+            if distance is not None and distance <= FACE_MATCH_MAX_DISTANCE:
+                return user, distance, True
+        user, distance = self.match(embedding)
+        if user is None or distance > FACE_MATCH_MAX_DISTANCE:
+            user = None
+        if cache is not None:
+            cache.put(user) if user is not None else cache.clear()
+        return user, distance, False
+
+
+class MatchCache:
+    """A session's last successful match, kept for FACE_MATCH_CACHE_S seconds."""
+
+    def __init__(self, ttl=None):
+        self.ttl = FACE_MATCH_CACHE_S if ttl is None else ttl
+        self.user = None
+        self.matched_at = None
+
+    def get(self):
+        if self.user is None or time.monotonic() - self.matched_at > self.ttl:
+            return None
+        return self.user
+
+    def put(self, user):
+        self.user = user
+        self.matched_at = time.monotonic()
+
+    def clear(self):
+        self.user = None
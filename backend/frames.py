@@ -0,0 +1,140 @@
+"""
+Frame decoding and shared preprocessing.
+
+Webcam frames are brought down to each endpoint's target size once, at decode
+time: JPEGs are decoded directly at 1/2, 1/4 or 1/8 scale (libjpeg DCT
+scaling, much cheaper than a full decode), and any remaining excess is
+removed with a single resize. The resulting Frame is shared by the face
+landmarker, the phone detector and the pose model, and derives its RGB and
+grayscale views lazily, at most once each.
+"""
+import os
+import struct
+import threading
+import weakref
+
+import cv2
+import numpy as np
+
+from telemetry import stage_timer
+
+# Longest side (pixels) each endpoint works at; 0 keeps the full resolution
+FRAME_MAX_SIDE = {
+    "analyze_face": int(os.getenv("MAX_SIDE_ANALYZE_FACE", "640")),
+    "face_auth": int(os.getenv("MAX_SIDE_FACE_AUTH", "640")),
+    "exercise": int(os.getenv("MAX_SIDE_EXERCISE", "320")),  # Pose runs at POSE_IMGSZ
+    "analyze": int(os.getenv("MAX_SIDE_ANALYZE", "640")),  # Combined face + exercise
+}
+
+_REDUCED_FLAGS = [(8, cv2.IMREAD_REDUCED_COLOR_8),
+                  (4, cv2.IMREAD_REDUCED_COLOR_4),
+                  (2, cv2.IMREAD_REDUCED_COLOR_2)]
+# JPEG start-of-frame markers that carry the image size
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_size(data):
+    """(width, height) from a JPEG header without decoding, or None if not a JPEG."""
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # Fill byte
+            i += 1
+            continue
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        if marker in _SOF_MARKERS:
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None
+
+
+def decode_frame(data, max_side=0):
+    """
+    Decodes encoded image bytes into a BGR frame whose longest side is at most
+    `max_side` (0 = no limit).
+    """
+    flag = cv2.IMREAD_COLOR
+    if max_side:
+        size = jpeg_size(data)
+        if size is not None:
+            longest = max(size)
+            # Largest DCT reduction that still leaves at least max_side pixels
+            for factor, reduced_flag in _REDUCED_FLAGS:
+                if longest // factor >= max_side:
+                    flag = reduced_flag
+                    break
+
+    frame = cv2.imdecode(np.frombuffer(data, np.uint8), flag)
+    if frame is None:
+        raise ValueError("Could not decode image")
+
+    if max_side and max(frame.shape[:2]) > max_side:
+        scale = max_side / max(frame.shape[:2])
+        frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return frame
+
+
+# Per-thread conversion buffers, reused while the frame size stays the same.
+# A buffer belongs to one Frame at a time: handing it to another Frame drops
+# the previous owner's cached conversion, which is redone on its next use.
+# Consumers copy what they keep (MediaPipe copies into its own image).
+_buffers = threading.local()
+
+
+def _buffer(name, shape, owner):
+    buffers = getattr(_buffers, "by_name", None)
+    if buffers is None:
+        buffers = _buffers.by_name = {}
+    buf, previous = buffers.get(name, (None, None))
+    previous = previous() if previous is not None else None
+    if previous is not None and previous is not owner:
+        setattr(previous, "_" + name, None)
+    if buf is None or buf.shape != shape:
+        buf = np.empty(shape, dtype=np.uint8)
+    buffers[name] = (buf, weakref.ref(owner))
+    return buf
+
+
+class Frame:
+    def __init__(self, bgr):
+        self.bgr = bgr
+        self._rgb = None
+        self._gray = None
+
+    @classmethod
+    def decode(cls, data, max_side=0):
+        with stage_timer("decode"):
+            return cls(decode_frame(data, max_side))
+
+    @property
+    def shape(self):
+        return self.bgr.shape
+
+    @property
+    def rgb(self):
+        """
+        RGB view for MediaPipe, converted on first use into this thread's
+        shared buffer. Converting another Frame on the same thread takes the
+        buffer over, so copy the array if you keep it past that.
+        """
+        if self._rgb is None:
+            with stage_timer("color_rgb"):
+                self._rgb = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB, dst=_buffer("rgb", self.bgr.shape, self))
+        return self._rgb
+
+    @property
+    def gray(self):
+        """Grayscale view, converted on first use (same buffer sharing as rgb)."""
+        if self._gray is None:
+            with stage_timer("color_gray"):
+                self._gray = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY, dst=_buffer("gray", self.bgr.shape[:2], self))
+        return self._gray
+
+    def crop(self, left, top, right, bottom):
+        """Sub-frame view (no copy) of a pixel rectangle."""
+        return Frame(self.bgr[top:bottom, left:right])
@@ -0,0 +1,93 @@
+"""
+FaceLandmarker construction and per-session streaming landmarkers.
+
+IMAGE mode runs full face detection on every call. VIDEO and LIVE_STREAM
+modes let MediaPipe reuse its tracking between frames, which needs one
+landmarker instance per session fed with monotonic timestamps.
+"""
+import os
+import threading
+import time
+
+import mediapipe as mp
+from mediapipe.tasks import python
+from mediapipe.tasks.python import vision
+
+from face_metrics import landmarks_to_array
+
+# Running mode for streaming analysis (/api/analyze_face, /ws/analyze):
+# IMAGE, VIDEO or LIVE_STREAM. /api/face_auth one-shots always use IMAGE.
+FACE_RUNNING_MODE = os.getenv("FACE_RUNNING_MODE", "IMAGE").upper()
+# How long a LIVE_STREAM caller waits for its result callback
+LIVE_STREAM_TIMEOUT = float(os.getenv("LIVE_STREAM_TIMEOUT", "1.0"))
+
+
+def create_face_landmarker(model_path, running_mode="IMAGE", result_callback=None):
+    base_options = python.BaseOptions(model_asset_path=model_path)
+    options = vision.FaceLandmarkerOptions(base_options=base_options,
+                                           running_mode=vision.RunningMode[running_mode],
+                                           output_face_blendshapes=True,
+                                           output_facial_transformation_matrixes=True,
+                                           num_faces=1,
+                                           result_callback=result_callback)
+    return vision.FaceLandmarker.create_from_options(options)
+
+
+def to_mp_image(frame):
+    """Wraps a Frame's RGB view as an SRGB MediaPipe image."""
+    return mp.Image(image_format=mp.ImageFormat.SRGB, data=frame.rgb)
+
+
+class SessionLandmarker:
+    def __init__(self, model_path, running_mode):
+        self.running_mode = running_mode
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._last_timestamp = -1
+        # LIVE_STREAM results arrive through the callback
+        self._result_ready = threading.Condition()
+        self._result = None
+        self._result_timestamp = -1
+
+        callback = self._on_result if running_mode == "LIVE_STREAM" else None
+        self._landmarker = create_face_landmarker(model_path, running_mode, callback)
+
+    def _timestamp_ms(self):
+        # MediaPipe rejects timestamps that don't strictly increase
+        timestamp = int((time.monotonic() - self._start) * 1000)
+        timestamp = max(timestamp, self._last_timestamp + 1)
+        self._last_timestamp = timestamp
+        return timestamp
+
+    def _on_result(self, result, output_image, timestamp_ms):
+        with self._result_ready:
+            self._result = result
+            self._result_timestamp = timestamp_ms
+            self._result_ready.notify_all()
+
+    def detect(self, frame):
+        """Returns one (478, 3) float32 landmark array per face found in a Frame."""
+        mp_image = to_mp_image(frame)
+        with self._lock:
+            if self._landmarker is None:
+                return []
+            timestamp = self._timestamp_ms()
+            if self.running_mode == "VIDEO":
+                result = self._landmarker.detect_for_video(mp_image, timestamp)
+            else:
+                with self._result_ready:
+                    self._landmarker.detect_async(mp_image, timestamp)
+                    # A busy graph may drop the frame; an older frame's result is
+                    # not this frame's, so a timeout reports no face
+                    fresh = self._result_ready.wait_for(lambda: self._result_timestamp >= timestamp,
+                                                        timeout=LIVE_STREAM_TIMEOUT)
+                    result = self._result if fresh else None
+            if result is None:
+                return []
+            return [landmarks_to_array(landmarks) for landmarks in result.face_landmarks]
+
+    def close(self):
+        with self._lock:
+            if self._landmarker is not None:
+                self._landmarker.close()
+                self._landmarker = None
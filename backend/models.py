@@ -0,0 +1,125 @@
+"""
+Lazy model loading.
+
+Models are loaded on first use (or warmed in a background thread at startup)
+instead of at import time, so the server starts immediately and lightweight
+endpoints never wait for YOLO, MediaPipe or the OpenAI client.
+"""
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+# Optional export of the YOLO models ("onnx" or "openvino"); exported artifacts
+# are cached next to the .pt files and loaded instead of the PyTorch weights
+YOLO_EXPORT_FORMAT = os.getenv("YOLO_EXPORT_FORMAT", "").lower()
+WARMUP_FRAME_SHAPE = (480, 640, 3)
+
+log = logging.getLogger(__name__)
+
+
+def exported_path(weights, export_format):
+    """Where ultralytics writes the export of `weights` for `export_format`."""
+    stem, _ = os.path.splitext(weights)
+    if export_format == "onnx":
+        return stem + ".onnx"
+    if export_format == "openvino":
+        return stem + "_openvino_model"
+    raise ValueError(f"Unsupported YOLO_EXPORT_FORMAT: {export_format}")
+
+
+def load_yolo(weights, task, export_format=None):
+    """
+    Loads a YOLO model, optionally through a cached ONNX / OpenVINO export.
+    The export runs once; later starts load the cached artifact directly.
+    """
+    from ultralytics import YOLO
+
+    export_format = YOLO_EXPORT_FORMAT if export_format is None else export_format
+    if not export_format:
+        return YOLO(weights, task=task)
+
+    path = exported_path(weights, export_format)
+    if not os.path.exists(path):
+        log.info("Exporting %s to %s...", weights, export_format)
+        # Dynamic axes so micro-batches of any size run in one call
+        path = YOLO(weights, task=task).export(format=export_format, dynamic=True)
+    return YOLO(path, task=task)
+
+
+def warm_yolo(model):
+    """Runs a dummy frame so lazy initialization and graph setup happen now."""
+    model(np.zeros(WARMUP_FRAME_SHAPE, dtype=np.uint8), verbose=False)
+
+
+def warm_face_landmarker(detector):
+    from frames import Frame
+    from landmarker import to_mp_image
+    detector.detect(to_mp_image(Frame(np.zeros(WARMUP_FRAME_SHAPE, dtype=np.uint8))))
+
+
+class LazyModel:
+    def __init__(self, name, loader, warmup=None):
+        """
+        `loader()` builds the model; it runs at most once successfully.
+        `warmup(model)`, if given, runs right after loading.
+        """
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self._model = None
+        self._lock = threading.Lock()
+        self.load_time = None
+        self.warmup_time = None
+        self.error = None
+
+    @property
+    def ready(self):
+        return self._model is not None
+
+    def get(self):
+        """Returns the model, loading it on first use. Failed loads are retried."""
+        model = self._model
+        if model is not None:
+            return model
+        with self._lock:
+            if self._model is None:
+                start = time.perf_counter()
+                try:
+                    model = self.loader()
+                    loaded = time.perf_counter()
+                    if self.warmup is not None:
+                        self.warmup(model)
+                except Exception as e:
+                    self.error = str(e)
+                    raise
+                self.load_time = loaded - start
+                self.warmup_time = time.perf_counter() - loaded
+                self.error = None
+                self._model = model
+                log.info("Loaded %s in %.2fs (warm-up %.2fs)", self.name, self.load_time, self.warmup_time)
+            return self._model
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "load_time_s": round(self.load_time, 3) if self.load_time is not None else None,
+            "warmup_time_s": round(self.warmup_time, 3) if self.warmup_time is not None else None,
+            "error": self.error,
+        }
+
+
+def warm_in_background(models):
+    """Loads `models` one after another in a daemon thread."""
+    def warm():
+        for lazy in models:
+            try:
+                lazy.get()
+            except Exception as e:
+                log.warning("Could not load %s: %s", lazy.name, e)
+
+    thread = threading.Thread(target=warm, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,70 @@
+"""
+Cadence-limited phone detection.
+
+The YOLO object pass only looks for COCO class 67 (cell phone) but costs more
+than the face landmarker, so it is re-run every N frames or when the scene
+changes noticeably. In between, the last `using_phone` result is reused and
+reported together with its age.
+"""
+import os
+import time
+
+import cv2
+import numpy as np
+
+# Run the detector at least every N frames (1 = every frame)
+PHONE_DETECT_EVERY_N = int(os.getenv("PHONE_DETECT_EVERY_N", "3"))
+# Mean absolute difference (0..1) of a tiny grayscale thumbnail, compared to the
+# frame the detector last ran on, that forces an early re-run
+PHONE_MOTION_THRESHOLD = float(os.getenv("PHONE_MOTION_THRESHOLD", "0.04"))
+
+THUMB_SIZE = (32, 24)
+PHONE_CLASS_ID = 67  # COCO 'cell phone'
+
+
+def result_has_phone(result):
+    """Whether an ultralytics detection result contains a cell phone box."""
+    if result is None:
+        return False
+    for box in result.boxes:
+        if int(box.cls[0]) == PHONE_CLASS_ID:
+            return True
+    return False
+
+
+def scene_thumbnail(frame):
+    """Tiny grayscale float thumbnail of a Frame, used as a cheap scene-change signal."""
+    return cv2.resize(frame.gray, THUMB_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32) / 255.0
+
+
+class PhoneCadence:
+    def __init__(self, every_n=None, motion_threshold=None):
+        self.every_n = max(1, every_n or PHONE_DETECT_EVERY_N)
+        self.motion_threshold = PHONE_MOTION_THRESHOLD if motion_threshold is None else motion_threshold
+        self.using_phone = False
+        self.frames_since_run = None  # None until the detector has run once
+        self.last_run_time = None
+        self.last_thumb = None
+
+    def check(self, frame, detect):
+        """
+        Returns (using_phone, age_frames, age_seconds) for a Frame.
+        `detect(frame) -> bool` is only called when the cadence or the scene
+        change signal asks for a fresh detection.
+        """
+        thumb = scene_thumbnail(frame)
+
+        run = self.frames_since_run is None or self.frames_since_run + 1 >= self.every_n
+        if not run and self.last_thumb is not None:
+            motion = float(np.mean(np.abs(thumb - self.last_thumb)))
+            run = motion > self.motion_threshold
+
+        if run:
+            self.using_phone = bool(detect(frame))
+            self.last_run_time = time.time()
+            self.last_thumb = thumb
+            self.frames_since_run = 0
+        else:
+            self.frames_since_run += 1
+
+        return self.using_phone, self.frames_since_run, time.time() - self.last_run_time
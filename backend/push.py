@@ -0,0 +1,65 @@
+"""
+Change-only delivery of the dashboard data.
+
+- event_stream(): Server-Sent Events that send one full snapshot, then only
+  the top-level keys whose value changed since the last event.
+- etag_response(): ETag / If-None-Match support so polling clients get an
+  empty 304 when nothing changed.
+"""
+import asyncio
+import hashlib
+import json
+import os
+
+from fastapi import Response
+from fastapi.concurrency import run_in_threadpool
+
+# How often the stream re-checks the snapshot, and how long it stays silent
+# before sending a keep-alive comment
+SSE_INTERVAL_S = float(os.getenv("SSE_INTERVAL_S", "2"))
+SSE_KEEPALIVE_S = float(os.getenv("SSE_KEEPALIVE_S", "15"))
+
+
+def _dumps(payload):
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+def etag_response(request, payload):
+    """JSON response with an ETag; 304 Not Modified if the client already has it."""
+    body = _dumps(payload).encode("utf-8")
+    etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def sse_event(name, payload):
+    return f"event: {name}\ndata: {_dumps(payload)}\n\n"
+
+
+async def event_stream(request, snapshot, interval=None, keepalive=None):
+    """
+    SSE generator: a `snapshot` event, then `delta` events with changed keys.
+    `snapshot()` is a blocking callable returning a dict; it runs in the threadpool.
+    """
+    interval = SSE_INTERVAL_S if interval is None else interval
+    keepalive = SSE_KEEPALIVE_S if keepalive is None else keepalive
+
+    last = await run_in_threadpool(snapshot)
+    yield f"retry: {int(interval * 1000)}\n" + sse_event("snapshot", last)
+
+    silent = 0.0
+    while not await request.is_disconnected():
+        await asyncio.sleep(interval)
+        current = await run_in_threadpool(snapshot)
+        delta = {key: value for key, value in current.items() if last.get(key) != value}
+        if delta:
+            last = current
+            silent = 0.0
+            yield sse_event("delta", delta)
+        else:
+            silent += interval
+            if silent >= keepalive:
+                silent = 0.0
+                yield ": keep-alive\n\n"
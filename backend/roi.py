@@ -0,0 +1,80 @@
+"""
+Face region-of-interest tracking.
+
+Keeps the previous frame's face bounding box per session. The next frame is
+cropped to an expanded ROI around it and downscaled before running the face
+landmarker; landmarks are mapped back to full-frame normalized coordinates.
+When no face is found in the ROI the full frame is searched again.
+"""
+import os
+
+import cv2
+
+from frames import Frame
+
+ROI_TRACKING = os.getenv("ROI_TRACKING", "1") == "1"
+# Fraction of the face box size added on every side of the ROI
+ROI_MARGIN = float(os.getenv("ROI_MARGIN", "0.5"))
+# ROI crops are downscaled so their longest side is at most this many pixels
+ROI_MAX_SIDE = int(os.getenv("ROI_MAX_SIDE", "256"))
+
+
+def landmarks_bbox(points):
+    """Normalized (x0, y0, x1, y1) bounding box of an (N, 3) landmark array."""
+    x0, y0 = points[:, :2].min(axis=0)
+    x1, y1 = points[:, :2].max(axis=0)
+    return float(x0), float(y0), float(x1), float(y1)
+
+
+class FaceTracker:
+    def __init__(self, margin=None, max_side=None):
+        self.margin = ROI_MARGIN if margin is None else margin
+        self.max_side = max_side or ROI_MAX_SIDE
+        self.box = None  # Last face box, normalized full-frame coordinates
+
+    def crop(self, width, height):
+        """Pixel ROI (x0, y0, x1, y1) around the last face box, or None when not tracking."""
+        if self.box is None:
+            return None
+        x0, y0, x1, y1 = self.box
+        pad_x = (x1 - x0) * self.margin
+        pad_y = (y1 - y0) * self.margin
+        left = max(0, int((x0 - pad_x) * width))
+        top = max(0, int((y0 - pad_y) * height))
+        right = min(width, int((x1 + pad_x) * width) + 1)
+        bottom = min(height, int((y1 + pad_y) * height) + 1)
+        if right - left < 16 or bottom - top < 16:
+            return None
+        return left, top, right, bottom
+
+    def detect(self, frame, detect):
+        """
+        Runs `detect(Frame) -> [landmark arrays]` on the tracked ROI of `frame`,
+        falling back to the full frame, and returns full-frame landmark arrays.
+        """
+        height, width = frame.shape[:2]
+        crop = self.crop(width, height)
+        if crop is not None:
+            left, top, right, bottom = crop
+            roi = frame.crop(left, top, right, bottom)
+            scale = self.max_side / max(roi.shape[:2])
+            if scale < 1:
+                roi = Frame(cv2.resize(roi.bgr, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA))
+
+            faces = detect(roi)
+            if faces:
+                crop_w, crop_h = right - left, bottom - top
+                mapped = []
+                for points in faces:
+                    points = points.copy()
+                    points[:, 0] = (points[:, 0] * crop_w + left) / width
+                    points[:, 1] = (points[:, 1] * crop_h + top) / height
+                    points[:, 2] *= crop_w / width  # z shares the x scale
+                    mapped.append(points)
+                self.box = landmarks_bbox(mapped[0])
+                return mapped
+
+        # Not tracking or tracking lost: search the full frame
+        faces = detect(frame)
+        self.box = landmarks_bbox(faces[0]) if faces else None
+        return faces
@@ -0,0 +1,89 @@
+"""
+Latest-frame-wins inference scheduling.
+
+Each session has at most one frame being processed and one frame waiting.
+A newer frame replaces the waiting one, so slow inference never builds a
+backlog of stale frames: the replaced caller gets FrameSuperseded and the
+next delivered result reports how many frames were dropped in between.
+"""
+import asyncio
+
+from fastapi.concurrency import run_in_threadpool
+
+from telemetry import FRAMES_DROPPED
+
+
+class FrameSuperseded(Exception):
+    """Raised to a caller whose pending frame was replaced by a newer one."""
+
+
+class _Slot:
+    def __init__(self):
+        self.pending = None  # (args, future) waiting to run
+        self.running = False
+        self.dropped = 0     # Frames superseded since the last delivered result
+
+
+class LatestFrameScheduler:
+    def __init__(self, process, run=None, name=None):
+        """
+        `process(*args)` is the blocking inference call, executed through
+        `await run(process, *args)` (the threadpool by default). `name`
+        labels the dropped-frame counter.
+        """
+        self.process = process
+        self.name = name or process.__name__
+        self.run = run or run_in_threadpool
+        self.slots = {}
+        self.total_dropped = 0
+        self._tasks = set()
+
+    async def submit(self, session_id, *args):
+        """
+        Queues a frame for `session_id` and waits for its result.
+        Returns (result, dropped), where dropped is the number of frames of this
+        session that were superseded since the previous delivered result.
+        """
+        slot = self.slots.get(session_id)
+        if slot is None:
+            slot = self.slots[session_id] = _Slot()
+
+        future = asyncio.get_running_loop().create_future()
+        if slot.pending is not None:
+            _, stale = slot.pending
+            if not stale.done():
+                stale.set_exception(FrameSuperseded())
+            slot.dropped += 1
+            self.total_dropped += 1
+            FRAMES_DROPPED.inc(label=self.name)
+        slot.pending = (args, future)
+
+        if not slot.running:
+            slot.running = True
+            task = asyncio.ensure_future(self._drain(session_id, slot))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        return await future
+
+    async def _drain(self, session_id, slot):
+        try:
+            while slot.pending is not None:
+                args, future = slot.pending
+                slot.pending = None
+                if future.done():  # Caller went away while waiting
+                    continue
+
+                dropped, slot.dropped = slot.dropped, 0
+                try:
+                    result = await self.run(self.process, *args)
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result((result, dropped))
+        finally:
+            slot.running = False
+            if slot.pending is None and self.slots.get(session_id) is slot:
+                del self.slots[session_id]
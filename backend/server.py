@@ -1,19 +1,36 @@
-import cv2
-import mediapipe as mp
-
 import base64
-import numpy as np
 import uvicorn
 import re
-from fastapi import FastAPI, UploadFile, File, Body
+from fastapi import FastAPI, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 import os
 from dotenv import load_dotenv
-from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
-from comtypes import CLSCTX_ALL
 import time
+import asyncio
+import hmac
+import logging
+from scheduler import LatestFrameScheduler, FrameSuperseded
+from frames import Frame, FRAME_MAX_SIDE
+from phone_cadence import result_has_phone
+from sessions import SessionStore
+from roi import ROI_TRACKING
+from landmarker import create_face_landmarker, to_mp_image, SessionLandmarker, FACE_RUNNING_MODE
+from batching import BatchWorker
+from worker_pool import InferencePool, INFERENCE_WORKERS
+from face_metrics import landmarks_to_array
+from analysis import score_face, no_face
+from exercise import extract_pose, POSE_IMGSZ, EXERCISES
+from face_gallery import FaceGallery, face_embedding
+from push import etag_response, event_stream, sse_event
+from chat import ChatService, load_async_openai_client
+from volume import VolumeSampler
+from admission import InferenceExecutor, EndpointLimiter, ServerBusy, ENDPOINT_CONCURRENCY, BUSY_RETRY_AFTER_S
+from models import LazyModel, warm_in_background, load_yolo, warm_yolo, warm_face_landmarker
+from telemetry import (setup_logging, stage_timer, render_prometheus,
+                       FRAMES_PROCESSED, FACES_FOUND, PHONE_HITS)
 
 # Load .env from parent directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -21,6 +38,10 @@ parent_dir = os.path.dirname(current_dir)
 dotenv_path = os.path.join(parent_dir, '.env')
 load_dotenv(dotenv_path)
 
+# Leveled logging (LOG_LEVEL); records are written by a background thread
+setup_logging()
+log = logging.getLogger("server")
+
 app = FastAPI()
 
 # Enable CORS
@@ -40,6 +61,53 @@ class ImageRequest(BaseModel):
     image: str
 
 
+# --- Frame Transport ---
+# Vision endpoints accept the encoded JPEG/PNG in one of three forms:
+# - raw bytes (application/octet-stream or image/*), preferred: no base64 inflation
+# - multipart/form-data with an "image" file field
+# - JSON {"image": "<data URL or base64>"} for older clients
+def decode_data_url(image):
+    """Strips an optional data-URL header and base64-decodes the payload."""
+    if "," in image:
+        header, image = image.split(",", 1)
+    return base64.b64decode(image)
+
+async def frame_bytes(request: Request) -> bytes:
+    """
+    Dependency returning the encoded image bytes of a vision request.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("application/json"):
+        try:
+            req = ImageRequest(**await request.json())
+            data = decode_data_url(req.image)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid JSON image payload")
+    elif content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("image")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Missing 'image' file field")
+        data = await upload.read()
+    else:
+        data = await request.body()
+
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty image payload")
+    return data
+
+def session_key(request: Request) -> str:
+    """
+    Identifies the client session for per-session scheduling and state.
+    Clients may send an X-Session-Id header or ?session= query parameter,
+    otherwise the client address is used.
+    """
+    session = request.headers.get("x-session-id") or request.query_params.get("session")
+    if session:
+        return session
+    return request.client.host if request.client else "default"
+
+
 # --- Mock Data ---
 WEATHER_DATA = {
     "temp": "19°C",
@@ -63,73 +131,121 @@ NEWS_DATA = [
 
 
 # --- YOLOv8 Setup ---
-from ultralytics import YOLO
-model = YOLO('yolov8n-pose.pt')
-object_model = YOLO('yolov8n.pt') # Load object detection model
-
-# Global State
-squat_count = 0
-current_stage = None
-landmark_history = []  # To track head movement
-MAX_HISTORY = 5      # Reduced for 1s polling
+# Models load on first use or in the background at startup (MODEL_WARMUP),
+# so importing the server never blocks on them
+POSE_WEIGHTS = 'yolov8n-pose.pt'
+OBJECT_WEIGHTS = 'yolov8n.pt'
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+
+# Each model runs a dummy frame right after loading so the first real request
+# doesn't pay ultralytics' lazy initialization; YOLO_EXPORT_FORMAT=onnx/openvino
+# loads a cached export instead of the .pt weights
+pose_model = LazyModel("pose_model", lambda: load_yolo(POSE_WEIGHTS, "pose"), warmup=warm_yolo)
+object_model = LazyModel("object_model", lambda: load_yolo(OBJECT_WEIGHTS, "detect"), warmup=warm_yolo) # Object detection model
+
+# Micro-batching: frames from concurrent requests that arrive within
+# BATCH_WINDOW_MS are run through each model as one batched call
+pose_batcher = BatchWorker(lambda frames: pose_model.get()(frames, verbose=False, imgsz=POSE_IMGSZ), name="pose-batcher")
+object_batcher = BatchWorker(lambda frames: object_model.get()(frames, verbose=False, conf=0.4), name="object-batcher")
+
+# Per-session State (squat counter, stage, head-movement window, phone cadence).
+# get() and reset() run on the event loop, so dropped sessions are closed on
+# the inference executor
+sessions = SessionStore(closer=lambda state: inference_executor.submit(state.close))
 
 # Using MediaPipe Tasks API for face detection and mesh
-from mediapipe.tasks import python
-from mediapipe.tasks.python import vision
-
-# Initialize MediaPipe Face Landmarker (Tasks API)
+# Initialize MediaPipe Face Landmarker (Tasks API) in IMAGE mode for one-shots;
+# with FACE_RUNNING_MODE=VIDEO/LIVE_STREAM each session gets its own landmarker
 # Ensure face_landmarker.task is in the backend folder
 model_path = os.path.join(os.path.dirname(__file__), 'face_landmarker.task')
-
-base_options = python.BaseOptions(model_asset_path=model_path)
-options = vision.FaceLandmarkerOptions(base_options=base_options,
-                                       output_face_blendshapes=True,
-                                       output_facial_transformation_matrixes=True,
-                                       num_faces=1)
-detector = vision.FaceLandmarker.create_from_options(options)
-
-
-# --- EAR / MAR / Stress Helpers ---
-def calculate_distance(p1, p2):
-    return np.sqrt((p1.x - p2.x)**2 + (p1.y - p2.y)**2)
-
-def calculate_ear(landmarks, eye_indices):
-    # Euclidean distance between vertical eye landmarks
-    A = calculate_distance(landmarks[eye_indices[1]], landmarks[eye_indices[5]])
-    B = calculate_distance(landmarks[eye_indices[2]], landmarks[eye_indices[4]])
-    # Euclidean distance between horizontal eye landmarks
-    C = calculate_distance(landmarks[eye_indices[0]], landmarks[eye_indices[3]])
-    if C == 0: return 0
-    ear = (A + B) / (2.0 * C)
-    return ear
-
-def calculate_mar(landmarks, mouth_indices):
-    # Vertical distance
-    A = calculate_distance(landmarks[mouth_indices[1]], landmarks[mouth_indices[7]]) # Upper lip to lower lip (inner)
-    B = calculate_distance(landmarks[mouth_indices[2]], landmarks[mouth_indices[6]]) # Upper lip to lower lip (outer or slightly side)
-    C = calculate_distance(landmarks[mouth_indices[3]], landmarks[mouth_indices[5]]) # Another vertical pair
-    # Horizontal distance
-    D = calculate_distance(landmarks[mouth_indices[0]], landmarks[mouth_indices[4]]) # Corner to corner
-    if D == 0: return 0
-    mar = (A + B + C) / (2.0 * D) # Simple MAR
-    return mar
-
-# Indices for Right Eye (MediaPipe 468 landmarks)
-# 33, 160, 158, 133, 153, 144
-RIGHT_EYE = [33, 160, 158, 133, 153, 144]
-# Indices for Left Eye
-# 362, 385, 387, 263, 373, 380
-LEFT_EYE = [362, 385, 387, 263, 373, 380]
-# Indices for Mouth (Outer lips for MAR usually, or inner)
-# Using roughly: 61 (left corner), 291 (right corner), and top/bottom points
-# Let's use simpler 6 points for MAR: [61, 81, 13, 312, 291, 317, 14, 178]...
-# Standard MAR points: 
-# P1: 61 (Left Corner), P2: 81 (Upper), P3: 13 (Upper Center), P4: 312 (Upper), P5: 291 (Right Corner)... 
-# Let's keep it simple: 
-# Horizontal: 61, 291. Vertical: 13, 14 (inner) or 0, 17 for outer.
-# Let's use: Left(61), UpperInner(13), LowerInner(14), Right(291)
-MOUTH = [61, 291, 13, 14] # Left, Right, Top, Bottom
-
+face_detector = LazyModel("face_landmarker", lambda: create_face_landmarker(model_path), warmup=warm_face_landmarker)
+
+# Optional process pool: INFERENCE_WORKERS > 0 moves MediaPipe/YOLO inference
+# into worker processes that each load their own models
+inference_pool = None
+if INFERENCE_WORKERS > 0:
+    inference_pool = InferencePool(INFERENCE_WORKERS, model_path, POSE_WEIGHTS, OBJECT_WEIGHTS)
+    log.info("Inference pool started with %d workers", INFERENCE_WORKERS)
+
+# Enrolled users for /api/face_auth, memory-mapped from FACE_GALLERY_DIR
+gallery = FaceGallery()
+
+# Samples the system volume in the background for /api/health/volume
+volume_sampler = VolumeSampler()
+
+# Vision inference runs on its own bounded executor with per-endpoint limits,
+# leaving the default threadpool to the lightweight endpoints
+inference_executor = InferenceExecutor()
+limiters = {name: EndpointLimiter(name, inference_executor) for name in ENDPOINT_CONCURRENCY}
+
+@app.exception_handler(ServerBusy)
+async def server_busy(request: Request, exc: ServerBusy):
+    return JSONResponse({"status": "busy", "endpoint": exc.endpoint, "message": str(exc)},
+                        status_code=503, headers={"Retry-After": str(BUSY_RETRY_AFTER_S)})
+
+@app.on_event("shutdown")
+def shutdown_inference_executor():
+    inference_executor.shutdown()
+
+@app.on_event("startup")
+def start_volume_sampler():
+    volume_sampler.start()
+
+@app.on_event("shutdown")
+def stop_volume_sampler():
+    volume_sampler.stop()
+
+@app.on_event("startup")
+def start_model_warmup():
+    # Workers load their own models, so only warm in-process ones
+    if MODEL_WARMUP and not inference_pool:
+        warm_in_background([face_detector, object_model, pose_model])
+
+@app.on_event("shutdown")
+def shutdown_inference_pool():
+    if inference_pool:
+        inference_pool.shutdown()
+
+def detect_faces(frame):
+    """Returns one (478, 3) float32 landmark array per face found in a Frame."""
+    if inference_pool:
+        with stage_timer("landmarker"):
+            return inference_pool.face_landmarks(frame.bgr)
+
+    # Convert to RGB for MediaPipe
+    mp_image = to_mp_image(frame)
+    detector = face_detector.get()
+    with stage_timer("landmarker"):
+        result = detector.detect(mp_image)
+    return [landmarks_to_array(landmarks) for landmarks in result.face_landmarks]
+
+def find_faces(frame, session_state, stream=True):
+    """
+    Face landmarks for a frame of `session_state`'s stream.
+    Streaming calls use the session's VIDEO/LIVE_STREAM landmarker when configured
+    (in-process only); otherwise detect_faces runs on the tracked face ROI when
+    ROI_TRACKING is on.
+    """
+    if stream and FACE_RUNNING_MODE != "IMAGE" and not inference_pool:
+        if session_state.landmarker is None:
+            session_state.landmarker = SessionLandmarker(model_path, FACE_RUNNING_MODE)
+        landmarker = session_state.landmarker
+        frame.rgb  # Convert outside the landmarker timing
+        with stage_timer("landmarker"):
+            return landmarker.detect(frame)
+    if ROI_TRACKING:
+        return session_state.face_tracker.detect(frame, detect_faces)
+    return detect_faces(frame)
+
+def detect_pose(frame):
+    """Normalized (17, 3) keypoints (x, y, confidence) of the main person in a Frame, or None."""
+    with stage_timer("yolo_pose"):
+        if inference_pool:
+            return inference_pool.pose(frame.bgr)
+
+        # Batched with concurrent requests (includes time waiting for the batch)
+        result = pose_batcher.submit(frame.bgr)
+    return extract_pose(result, frame.shape)
 
 
 # --- Spotify Setup ---
@@ -137,21 +253,58 @@ MOUTH = [61, 291, 13, 14] # Left, Right, Top, Bottom
 
 # --- Endpoints ---
 
+def status_payload():
+    models = {lazy.name: lazy.status() for lazy in (face_detector, pose_model, object_model, openai_client)}
+    return {
+        "status": "running",
+        "backend": "FastAPI/YOLOv8/MediaPipe",
+        # Vision endpoints answer without waiting for model loads once these are ready
+        "ready": inference_pool is not None or all(models[lazy.name]["ready"] for lazy in (face_detector, pose_model, object_model)),
+        "models": models,
+        "inference": {name: limiter.status() for name, limiter in limiters.items()},
+        "face_gallery": {"users": len(gallery)},
+    }
+
+# GET endpoints answer with an ETag so polling clients get a 304 when unchanged
 @app.get("/api/status")
-def health_check():
-    return {"status": "running", "backend": "FastAPI/YOLOv8/MediaPipe"}
+def health_check(request: Request):
+    return etag_response(request, status_payload())
 
 @app.get("/api/weather")
-def get_weather():
-    return WEATHER_DATA
+def get_weather(request: Request):
+    return etag_response(request, WEATHER_DATA)
 
 @app.get("/api/news")
-def get_news():
-    return NEWS_DATA
+def get_news(request: Request):
+    return etag_response(request, NEWS_DATA)
 
 @app.get("/api/apps")
-def get_apps():
-    return DEFAULT_APPS
+def get_apps(request: Request):
+    return etag_response(request, DEFAULT_APPS)
+
+def dashboard_snapshot():
+    return {
+        "status": status_payload(),
+        "weather": WEATHER_DATA,
+        "news": NEWS_DATA,
+        "apps": DEFAULT_APPS,
+        "volume": read_volume(),
+    }
+
+@app.get("/api/metrics")
+def metrics():
+    """Stage latency histograms and frame counters in Prometheus text format."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/events")
+def dashboard_events(request: Request):
+    """
+    Server-Sent Events replacing the dashboard's 5 s polling: one `snapshot`
+    event with status/weather/news/apps/volume, then `delta` events carrying
+    only the keys that changed.
+    """
+    return StreamingResponse(event_stream(request, dashboard_snapshot), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @app.post("/api/resolve")
@@ -182,306 +335,357 @@ def resolve_url(req: ResolveRequest):
     return {"url": url}
 
 @app.post("/api/face_auth")
-def face_auth(req: ImageRequest = Body(...)):
+async def face_auth(data: bytes = Depends(frame_bytes), session: str = Depends(session_key)):
+    return await limiters["face_auth"].run(authorize_face, data, sessions.get(session))
+
+def authorize_face(data, session_state):
+    """
+    Matches the face in one encoded frame against the enrolled gallery. A
+    session's last match is re-checked against that one user first, so a
+    user who stays in front of the kiosk skips the gallery search until
+    FACE_MATCH_CACHE_S runs out.
+    """
     try:
         # Decode
-        if "," in req.image:
-             header, encoded = req.image.split(",", 1)
-        else:
-             encoded = req.image
-             
-        nparr = np.frombuffer(base64.b64decode(encoded), np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        # Convert to RGB for MediaPipe
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Create MP Image
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
-        
-        # Detect
-        detection_result = detector.detect(mp_image)
+        frame = Frame.decode(data, FRAME_MAX_SIDE["face_auth"])
+        FRAMES_PROCESSED.inc(label="face_auth")
         
-        authorized = False
-        message = "Scanning..."
-        
-        if len(detection_result.face_landmarks) > 0:
-            authorized = True
-            message = "Authorized: User"
-            
-        return {"authorized": authorized, "message": message}
+        with session_state.lock:
+            # Detect
+            face_landmarks = find_faces(frame, session_state, stream=False)
+            if len(face_landmarks) == 0:
+                session_state.face_match.clear()
+                return {"authorized": False, "message": "Scanning..."}
+
+            # Match
+            embedding = face_embedding(face_landmarks[0], frame.shape)
+            start = time.perf_counter()
+            with stage_timer("face_match"):
+                user, distance, cached = gallery.identify(embedding, session_state.face_match)
+        match_ms = round((time.perf_counter() - start) * 1000, 3)
+
+        if user is None:
+            message = "Unknown face" if len(gallery) else "No users enrolled"
+            return {"authorized": False, "message": message, "match_ms": match_ms}
+        return {
+            "authorized": True,
+            "message": f"Authorized: {user['name']}",
+            "user_id": user["user_id"],
+            "name": user["name"],
+            "distance": round(distance, 4),
+            "cached": cached,
+            "match_ms": match_ms,
+        }
         
     except Exception as e:
-        print(f"Face Auth Error: {e}")
+        log.error("Face Auth Error: %s", e)
         return {"authorized": False, "message": "Error"}
 
+def enroll_admin(request: Request):
+    """
+    Dependency requiring the FACE_ENROLL_TOKEN admin credential, sent as
+    `Authorization: Bearer <token>`. Enrolling is disabled when no token is set.
+    """
+    expected = os.getenv("FACE_ENROLL_TOKEN", "")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Enrolling is disabled (FACE_ENROLL_TOKEN not set)")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Admin token required", headers={"WWW-Authenticate": "Bearer"})
+
+@app.post("/api/face_auth/enroll", dependencies=[Depends(enroll_admin)])
+async def face_auth_enroll(user_id: str, name: Optional[str] = None,
+                           data: bytes = Depends(frame_bytes), session: str = Depends(session_key)):
+    """
+    Adds one face sample for `user_id` to the gallery (call a few times with
+    different frames to average out noise). Admin only, see enroll_admin.
+    """
+    return await limiters["face_auth"].run(enroll_face, data, sessions.get(session), user_id, name)
+
+def enroll_face(data, session_state, user_id, name=None):
+    try:
+        frame = Frame.decode(data, FRAME_MAX_SIDE["face_auth"])
+        with session_state.lock:
+            face_landmarks = find_faces(frame, session_state, stream=False)
+            session_state.face_match.clear()
+        if len(face_landmarks) == 0:
+            return {"enrolled": False, "message": "No face found"}
+        user = gallery.enroll(user_id, face_embedding(face_landmarks[0], frame.shape), name)
+        return {"enrolled": True, "user": user, "gallery_size": len(gallery)}
+
+    except Exception as e:
+        log.error("Face Enroll Error: %s", e)
+        return {"enrolled": False, "message": "Error"}
+
+def detect_phone(frame):
+    """Runs the YOLO object model and reports whether a cell phone is visible in a Frame."""
+    with stage_timer("yolo_phone"):
+        if inference_pool:
+            found = inference_pool.phone(frame.bgr)
+        else:
+            # Lower confidence to 0.4 to catch partial phones (set on object_batcher)
+            found = result_has_phone(object_batcher.submit(frame.bgr))
+    if found:
+        PHONE_HITS.inc()
+    return found
+
 @app.post("/api/analyze_face")
-def analyze_face(req: ImageRequest = Body(...)):
+async def analyze_face(data: bytes = Depends(frame_bytes), session: str = Depends(session_key)):
+    try:
+        result, dropped = await face_scheduler.submit(session, data, sessions.get(session))
+    except FrameSuperseded:
+        return SUPERSEDED_RESPONSE
+    return {**result, "dropped_frames": dropped}
+
+def analyze_image(data, session_state):
+    """
+    Runs face-state and phone analysis on one encoded frame, using and updating
+    the head-movement window and phone cadence of the caller's SessionState.
+    """
     try:
         # Decode
-        if "," in req.image:
-             header, encoded = req.image.split(",", 1)
-        else:
-             encoded = req.image
-             
-        nparr = np.frombuffer(base64.b64decode(encoded), np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        # Convert to RGB for MediaPipe
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Create MP Image
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
-        
+        frame = Frame.decode(data, FRAME_MAX_SIDE["analyze_face"])
+        FRAMES_PROCESSED.inc(label="analyze_face")
+        return analyze_face_frame(frame, session_state)
+    except Exception as e:
+        log.error("Face Analysis Error: %s", e)
+        return {"detected": False, "state": "Error", "details": str(e)}
+
+def analyze_face_frame(frame, session_state):
+    """
+    Face-state and phone analysis of a decoded Frame. Holds the session lock:
+    /api/analyze, /api/analyze_face and /api/face_auth run on different
+    schedulers and can update the same session concurrently.
+    """
+    with session_state.lock:
         # Process
-        results = detector.detect(mp_image)
-        
-        # Check for Phone (Object Detection)
-        using_phone = False
-        # Lower confidence to 0.4 to catch partial phones
-        obj_results = object_model(frame, verbose=False, conf=0.4)
-        if obj_results:
-            for box in obj_results[0].boxes:
-                cls_id = int(box.cls[0])
-                # COCO Class 67 is 'cell phone'
-                if cls_id == 67:
-                    using_phone = True
-                    # print("DEBUG: Phone detected!") 
-                    break
-
-        state = "Focused"
-        details = "Normal baseline"
-        
-        if len(results.face_landmarks) > 0:
-            landmarks = results.face_landmarks[0]
-            
-            # --- Head Movement Tracking ---
-            # Use nose tip (landmark 1) for movement tracking
-            nose_tip = landmarks[1]
-            landmark_history.append({'x': nose_tip.x, 'y': nose_tip.y, 'time': time.time()})
-            if len(landmark_history) > MAX_HISTORY:
-                landmark_history.pop(0)
-
-            # Detect Head Shaking (Horizontal movement)
-            head_shaking = False
-            if len(landmark_history) >= 3:
-                # Calculate horizontal variance
-                x_coords = [p['x'] for p in landmark_history]
-                x_range = max(x_coords) - min(x_coords)
-                # If movement is mostly horizontal and significant
-                if x_range > 0.08: # Increased threshold for less sensitivity
-                     head_shaking = True
-
-            # EAR
-            ear_right = calculate_ear(landmarks, RIGHT_EYE)
-            ear_left = calculate_ear(landmarks, LEFT_EYE)
-            avg_ear = (ear_right + ear_left) / 2.0
-            
-            # MAR (Simple: height / width)
-            mouth_w = calculate_distance(landmarks[MOUTH[0]], landmarks[MOUTH[1]]) # 61 to 291
-            mouth_h = calculate_distance(landmarks[MOUTH[2]], landmarks[MOUTH[3]]) # 13 to 14
-            mar = 0
-            if mouth_w > 0:
-                mar = mouth_h / mouth_w
-                
-            # Stress Heuristics
-            # Brows: 107 (Left Brow Outer), 66 (Left Brow Inner), 296 (Right Brow Inner), 336 (Right Brow Outer)
-            brow_inner_dist = calculate_distance(landmarks[66], landmarks[296])
-            # Normalize by face width (454 to 234)
-            face_width = calculate_distance(landmarks[234], landmarks[454])
-            if face_width > 0:
-                norm_brow_dist = brow_inner_dist / face_width
-            else:
-                norm_brow_dist = 0.5 # default
-                
-            
-            # Thresholds (Tunable)
-            EAR_THRESHOLD = 0.22 # Below this = Drowsy
-            MAR_THRESHOLD = 0.6  # Above this = Yawning
-            
+        face_landmarks = find_faces(frame, session_state)
+    
+        # Check for Phone (Object Detection), re-run only on cadence or scene change
+        using_phone, phone_age_frames, phone_age_s = session_state.phone.check(frame, detect_phone)
+
+        if len(face_landmarks) > 0:
+            FACES_FOUND.inc()
+            result = score_face(face_landmarks[0], session_state)
+            metrics = result["metrics"]
             # Debug logs for tuning
-            # print(f"DEBUG: EAR:{avg_ear:.3f} MAR:{mar:.3f} BROW:{norm_brow_dist:.3f} SHAKE:{x_range if len(landmark_history) >= 8 else 0:.3f}")
-            
-            if mar > MAR_THRESHOLD:
-                state = "Yawning"
-                details = "Fatigue detected (Yawning)"
-            elif avg_ear < EAR_THRESHOLD:
-                state = "Drowsy"
-                details = "Fatigue detected (Drowsy)"
-            elif head_shaking or norm_brow_dist < 0.21:
-                state = "Headache"
-                details = "Head pain or tension detected"
-            else:
-                state = "Focused"
-                details = "User appears alert"
-                
+            log.debug("EAR:%.3f MAR:%.3f BROW:%.3f SHAKE:%s", metrics["ear"], metrics["mar"], metrics["brow"], result["head_shaking"])
             return {
-                "detected": True,
-                "state": state,
-                "details": details,
+                **result,
                 "using_phone": using_phone,  # Return phone detection status
-                "metrics": {
-                    "ear": float(avg_ear),
-                    "mar": float(mar),
-                    "brow": float(norm_brow_dist)
-                }
+                "phone_age_frames": phone_age_frames,  # Frames since the detector last ran
+                "phone_age_s": round(phone_age_s, 3),
             }
-                
-        landmark_history.clear() # Clear history when no face is found
-        return {"detected": False, "state": "No Face", "details": "No face detected"}
-        
-    except Exception as e:
-        print(f"Face Analysis Error: {e}")
-        return {"detected": False, "state": "Error", "details": str(e)}
 
+        return no_face(session_state)
 
-@app.get("/api/health/volume")
-def check_volume():
+
+# Latest-frame-wins scheduling: while a session's frame is being analyzed,
+# newer frames replace the waiting one instead of queueing behind it
+face_scheduler = LatestFrameScheduler(analyze_image, run=limiters["analyze_face"].run, name="analyze_face")
+SUPERSEDED_RESPONSE = {"detected": False, "state": "Superseded", "details": "Dropped in favour of a newer frame", "superseded": True}
+
+
+@app.websocket("/ws/analyze")
+async def analyze_stream(websocket: WebSocket):
     """
-    Checks system volume and returns if it's high and if Bluetooth is likely used.
+    Streaming face analysis.
+    Each binary message is one encoded frame (text messages may carry a data URL),
+    each reply is the same payload /api/analyze_face returns for that frame
+    (with ?changes_only=1, only replies whose state changed are sent).
     """
-    try:
-        # Get the default audio output device (e.g., Bluetooth, Speakers)
-        from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
-        from comtypes import CLSCTX_ALL
-        
-        devices = AudioUtilities.GetDefaultAudioEndpoint(0, 1) # 0 = eRender, 1 = eMultimedia
-        interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-        volume_interface = interface.QueryInterface(IAudioEndpointVolume)
-        
-        # Current volume as a scalar (0.0 to 1.0)
-        current_volume = volume_interface.GetMasterVolumeLevelScalar()
-        volume_percent = int(current_volume * 100)
-        print(f"Health Monitor: Active Audio Device Volume at {volume_percent}%")
-        
-        # Get device name to check for Bluetooth
-        # This is a bit complex in pycaw, but we can try getting the friendly name
-        is_bluetooth = False
+    await websocket.accept()
+    # Each connection owns its session state unless the client names one
+    session = websocket.query_params.get("session") or f"ws-{id(websocket)}"
+    # ?changes_only=1: push a result only when the face state changes
+    changes_only = websocket.query_params.get("changes_only") == "1"
+    send_lock = asyncio.Lock()
+    tasks = set()
+
+    async def analyze_and_send(data):
         try:
-            # We skip detailed device property check for speed, 
-            # but user can refine this if they have specific drivers
-            pass 
-        except:
-            pass
+            result, dropped = await face_scheduler.submit(session, data, sessions.get(session))
+        except FrameSuperseded:
+            return  # A newer frame from this connection is already queued
+        except ServerBusy:
+            result, dropped = {"busy": True, "detected": False, "state": "Busy", "details": "Server busy, frame skipped"}, 0
+        if changes_only and not result.get("state_changed", True):
+            return
+        async with send_lock:
+            await websocket.send_json({**result, "dropped_frames": dropped})
 
-        return {
-            "volume": volume_percent,
-            "is_high": volume_percent > 80,
-            "is_bluetooth": is_bluetooth, # Hard to detect reliably without extra libs, but we provide the field
-            "status": "success"
-        }
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("bytes") is not None:
+                data = message["bytes"]
+            else:
+                try:
+                    data = decode_data_url(message.get("text") or "")
+                except Exception as e:
+                    async with send_lock:
+                        await websocket.send_json({"detected": False, "state": "Error", "details": str(e)})
+                    continue
+
+            # Don't wait for inference: frames arriving meanwhile replace each other
+            task = asyncio.ensure_future(analyze_and_send(data))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        if "session" not in websocket.query_params:
+            sessions.reset(session)
+
+
+@app.get("/api/health/volume")
+def check_volume(request: Request):
+    return etag_response(request, read_volume())
+
+def read_volume():
+    """
+    Latest system volume, whether it's high and if Bluetooth is likely used.
+    Served from the background sampler's cache; no audio API calls here.
+    """
+    return volume_sampler.latest()
 
 @app.post("/api/exercise")
-def process_exercise(req: ImageRequest = Body(...)):
-    global squat_count, current_stage
+async def process_exercise(data: bytes = Depends(frame_bytes), session: str = Depends(session_key),
+                           exercises: Optional[str] = None):
+    """
+    Counts exercises on one frame. ?exercises=squat,neck_rolls selects which
+    registered exercises this session evaluates (default ENABLED_EXERCISES);
+    all of them share the frame's single pose inference.
+    """
+    names = None
+    if exercises:
+        # Validated here, without the session lock (inference threads hold it
+        # for a whole frame); enabled on the inference executor
+        names = [name.strip() for name in exercises.split(",") if name.strip()]
+        unknown = [name for name in names if name not in EXERCISES]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown exercise: {', '.join(unknown)}")
+    return await limiters["exercise"].run(exercise_frame, data, sessions.get(session), names)
+
+def exercise_frame(data, session_state, exercises=None):
     try:
         # Decode
-        header, encoded = req.image.split(",", 1)
-        nparr = np.frombuffer(base64.b64decode(encoded), np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        # Process with YOLO
-        results = model(frame, verbose=False)
+        frame = Frame.decode(data, FRAME_MAX_SIDE["exercise"])
+        FRAMES_PROCESSED.inc(label="exercise")
+        return count_squats(frame, session_state, exercises)
         
-        # YOLO COCO Keypoints: 11=Left Hip, 13=Left Knee
-        if results and results[0].keypoints is not None and results[0].keypoints.xy.shape[1] >= 14:
-            keypoints = results[0].keypoints.xy.cpu().numpy()[0] # Taking first person
-            
-            left_hip = keypoints[11]
-            left_knee = keypoints[13]
-            
-            # Check if detected (not 0,0)
-            if np.sum(left_hip) > 0 and np.sum(left_knee) > 0:
-                # Hip Y > Knee Y - offset -> Squatting (Down)
-                if left_hip[1] > (left_knee[1] - 50): 
-                     if current_stage != "down":
-                        current_stage = "down"
-                
-                if left_hip[1] < (left_knee[1] - 100) and current_stage == 'down':
-                     current_stage = "up"
-                     squat_count += 1
+    except Exception as e:
+        log.error("Exercise Error: %s", e)
+        return {"error": str(e)}
 
-        return {
-            "count": squat_count, 
-            "stage": current_stage,
-            "message": "Processed"
-        }
-        
+def count_squats(frame, state, exercises=None):
+    """
+    Updates the session's exercise counters from the pose in a decoded Frame,
+    first switching to the `exercises` names when given.
+    """
+    with state.lock:
+        if exercises:
+            state.exercise.enable(exercises)
+        # Pose inference is skipped while the user holds still
+        inferred = state.exercise.process(frame, detect_pose)
+        return state.exercise.summary(inferred)
+
+def analyze_combined(data, session_state):
+    """Face analysis and squat counting on one frame, decoded once."""
+    try:
+        frame = Frame.decode(data, FRAME_MAX_SIDE["analyze"])
     except Exception as e:
-        print(f"Error: {e}")
+        log.error("Decode Error: %s", e)
         return {"error": str(e)}
+    FRAMES_PROCESSED.inc(label="analyze")
+
+    try:
+        face = analyze_face_frame(frame, session_state)
+    except Exception as e:
+        log.error("Face Analysis Error: %s", e)
+        face = {"detected": False, "state": "Error", "details": str(e)}
+
+    try:
+        exercise = count_squats(frame, session_state)
+    except Exception as e:
+        log.error("Exercise Error: %s", e)
+        exercise = {"error": str(e)}
+
+    return {"face": face, "exercise": exercise}
+
+combined_scheduler = LatestFrameScheduler(analyze_combined, run=limiters["analyze"].run, name="analyze")
+
+@app.post("/api/analyze")
+async def analyze_all(data: bytes = Depends(frame_bytes), session: str = Depends(session_key)):
+    """
+    Combined endpoint: runs face analysis and pose counting on the same frame,
+    so clients send each webcam image once instead of once per endpoint.
+    """
+    try:
+        result, dropped = await combined_scheduler.submit(session, data, sessions.get(session))
+    except FrameSuperseded:
+        return {"superseded": True}
+    return {**result, "dropped_frames": dropped}
+
+@app.post("/api/session/reset")
+def reset_session(session: str = Depends(session_key)):
+    """Clears the caller's squat count, stage and face-tracking state."""
+    existed = sessions.reset(session)
+    return {"status": "reset", "session": session, "existed": existed}
 
 @app.post("/api/history")
 def log_history(req: ResolveRequest):
     # Retrieve title/url from body if needed, currently just logging
-    print(f"Visited: {req.query}")
+    log.info("Visited: %s", req.query)
     return {"status": "logged"}
 
 
 # --- OpenAI Setup ---
-from openai import OpenAI
-openai_api_key = os.getenv("OPENAI_API_KEY")
-client = None
-
-if openai_api_key:
-    try:
-        client = OpenAI(api_key=openai_api_key)
-        print("INFO: OpenAI Client Initialized Successfully")
-    except Exception as e:
-        print(f"ERROR: OpenAI Initialization Failed: {e}")
-else:
-    print("WARNING: OPENAI_API_KEY not found in .env")
+# Created on the first chat request; retried later if the key was added late
+openai_client = LazyModel("openai_client", load_async_openai_client)
+chat_service = ChatService(openai_client)
+if not os.getenv("OPENAI_API_KEY"):
+    log.warning("OPENAI_API_KEY not found in .env")
 
 
 @app.post("/api/chat")
-def chat_with_ai(req: ResolveRequest):
+async def chat_with_ai(req: ResolveRequest):
     """
     AI Chatbot endpoint - provides intelligent responses to user queries using OpenAI
     """
-    message = req.query.strip().lower()
-    
-    global client
-    
-    if not client:
-        # Try re-initializing if it failed or key was added late
-        api_key = os.getenv("OPENAI_API_KEY")
-        if api_key:
-            client = OpenAI(api_key=api_key)
-        else:
-            return {"response": "Error: OPENAI_API_KEY not configured.", "status": "error"}
-
     try:
-        # System Prompt
-        system_prompt = """You are an AI Wellness Assistant integrated into a browser. 
-        Your goal is to help users with:
-        - Wellness and fitness tips (especially squats and posture)
-        - Reducing screen time and eye strain
-        - Mental health advice (stress, anxiety)
-        - General productivity
-        
-        Be concise, friendly, and motivating. Use best practices for health advice."""
-        
-        # Generate Response
-        completion = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": message}
-            ]
-        )
-        
-        response = completion.choices[0].message.content
-        
-        print(f"DEBUG: OpenAI Response: {response}")
-        
+        response, cached = await chat_service.reply(req.query)
     except Exception as e:
-        print(f"DEBUG: OpenAI Error: {e}")
-        response = f"Error: {str(e)}"
-    
-    print(f"DEBUG: Returning: {response}")
-    return {"response": response, "status": "success"}
+        log.error("OpenAI Error: %s", e)
+        return {"response": f"Error: {e}", "status": "error"}
+
+    return {"response": response, "status": "success", "cached": cached}
+
+@app.post("/api/chat/stream")
+async def stream_chat(req: ResolveRequest):
+    """
+    Same as /api/chat, streamed as Server-Sent Events: `token` events with
+    text chunks, then `done` with the full reply (or `error`).
+    """
+    async def events():
+        parts = []
+        try:
+            async for text in chat_service.stream(req.query):
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+        except Exception as e:
+            log.error("OpenAI Error: %s", e)
+            yield sse_event("error", {"response": f"Error: {e}", "status": "error"})
+            return
+        yield sse_event("done", {"response": "".join(parts), "status": "success"})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 if __name__ == '__main__':
     # Run with uvicorn
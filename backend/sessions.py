@@ -0,0 +1,94 @@
+"""
+Per-session state store.
+
+Replaces the global squat counter, stage and head-movement window so every
+client gets its own. Sessions are kept in least-recently-used order, which
+makes idle eviction O(1) amortized per lookup; per-frame state uses
+fixed-size ring buffers.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from classifier import FaceStateClassifier
+from exercise import ExerciseEngine
+from face_gallery import MatchCache
+from phone_cadence import PhoneCadence
+from roi import FaceTracker
+
+MAX_HISTORY = 5      # Head-movement window, reduced for 1s polling
+# Sessions not seen for this many seconds are evicted
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "300"))
+# Session ids come from clients, so the store is capped; past this many the
+# least recently used session is evicted
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "256"))
+
+
+class SessionState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Face analysis
+        self.history = deque(maxlen=MAX_HISTORY)  # Nose tip (x, y, time) samples
+        self.classifier = FaceStateClassifier()
+        self.phone = PhoneCadence()
+        self.face_tracker = FaceTracker()
+        self.landmarker = None  # Per-session VIDEO/LIVE_STREAM landmarker, created on demand
+        self.face_match = MatchCache()  # Last /api/face_auth match
+        # Exercise counting
+        self.exercise = ExerciseEngine()
+        self.last_seen = time.monotonic()
+
+    def close(self):
+        """Releases per-session resources (the streaming landmarker)."""
+        if self.landmarker is not None:
+            self.landmarker.close()
+
+
+class SessionStore:
+    def __init__(self, idle_timeout=None, factory=SessionState, max_sessions=None, closer=None):
+        self.idle_timeout = SESSION_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        self.max_sessions = MAX_SESSIONS if max_sessions is None else max_sessions
+        # closer(state) releases a dropped session. Closing a streaming
+        # landmarker waits for its in-flight frame, so the server hands this
+        # to a worker thread instead of blocking the event loop.
+        self.closer = closer or (lambda state: state.close())
+        self.factory = factory
+        self._sessions = OrderedDict()  # Least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """Returns the state for `session_id`, creating it if needed."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                state = self._sessions[session_id] = self.factory()
+            else:
+                self._sessions.move_to_end(session_id)
+            state.last_seen = now
+            self._evict_idle(now)
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                self.closer(evicted)
+            return state
+
+    def reset(self, session_id):
+        """Drops the state of `session_id`. Returns whether it existed."""
+        with self._lock:
+            state = self._sessions.pop(session_id, None)
+        if state is None:
+            return False
+        self.closer(state)
+        return True
+
+    def _evict_idle(self, now):
+        while self._sessions:
+            session_id, state = next(iter(self._sessions.items()))
+            if now - state.last_seen < self.idle_timeout:
+                break
+            del self._sessions[session_id]
+            self.closer(state)
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,139 @@
+"""
+Hot-path instrumentation and logging.
+
+- Counters and latency histograms with fixed buckets: recording is one
+  bisect and a few additions under a lock, cheap enough for every frame.
+- stage_timer(): times one pipeline stage (decode, color conversion,
+  landmarker, YOLO, metrics) into the stage histogram.
+- render_prometheus(): Prometheus text exposition for /api/metrics.
+- setup_logging(): leveled logging through a queue, so request threads only
+  enqueue records and a background thread does the stdout writes.
+"""
+import atexit
+import bisect
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Seconds; spans sub-millisecond color conversions up to slow cold inference
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Counter:
+    def __init__(self, name, help, label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._values = {} if label else {None: 0}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, label=None):
+        with self._lock:
+            self._values[label] = self._values.get(label, 0) + amount
+
+    def value(self, label=None):
+        return self._values.get(label, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items(), key=lambda item: str(item[0]))
+        for label, value in values:
+            lines.append(f"{self.name}{_labels(self.label, label)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, label=None, buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}  # label -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, label=None):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                series = self._series[label] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted(((label, list(series)) for label, series in self._series.items()),
+                              key=lambda item: str(item[0]))
+        for label, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.label, label, le=bound)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label, label)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.label, label)} {cumulative}")
+        return lines
+
+
+def _labels(name, value, le=None):
+    pairs = []
+    if name is not None and value is not None:
+        pairs.append(f'{name}="{value}"')
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+STAGE_SECONDS = Histogram("backend_stage_seconds", "Time spent in each frame pipeline stage.", "stage")
+FRAMES_PROCESSED = Counter("backend_frames_processed_total", "Frames analyzed, by endpoint.", "endpoint")
+FRAMES_DROPPED = Counter("backend_frames_dropped_total", "Frames superseded by a newer frame before processing, by endpoint.", "endpoint")
+FACES_FOUND = Counter("backend_faces_found_total", "Frames in which a face was found.")
+PHONE_HITS = Counter("backend_phone_hits_total", "Phone detector runs that found a cell phone.")
+BUSY_REJECTIONS = Counter("backend_busy_rejections_total", "Requests turned away with 503 at the concurrency limit, by endpoint.", "endpoint")
+
+REGISTRY = [STAGE_SECONDS, FRAMES_PROCESSED, FRAMES_DROPPED, FACES_FOUND, PHONE_HITS, BUSY_REJECTIONS]
+
+
+@contextmanager
+def stage_timer(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage)
+
+
+def render_prometheus():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Logging ---
+_listener = None
+
+
+def setup_logging(level=None):
+    """Routes the root logger through a queue drained by a background thread (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(level or LOG_LEVEL)
@@ -0,0 +1,105 @@
+"""
+Chat service against a local stub of the completions API:
+python -m pytest backend/test_chat.py
+"""
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from chat import ChatService, ResponseCache
+
+stub = FastAPI()
+CALLS = []
+
+
+def _reply_text(message):
+    # Questions mentioning "silent" get an empty completion
+    return "" if "silent" in message else f"Try this: {message}"
+
+
+@stub.post("/v1/chat/completions")
+async def completions(request: Request):
+    body = await request.json()
+    CALLS.append(body)
+    text = _reply_text(body["messages"][-1]["content"])
+    if body.get("stream"):
+        def chunks():
+            for word in text.split():
+                chunk = {"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                         "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+    return {"id": "stub", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}}
+
+
+class ClientSource:
+    """Stands in for the LazyModel: a fresh AsyncOpenAI client per event loop."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def get(self):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key="test", base_url=self.base_url, timeout=5)
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started and time.monotonic() < deadline:
+        time.sleep(0.05)
+    yield f"http://127.0.0.1:{port}/v1"
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+@pytest.fixture
+def service(base_url):
+    CALLS.clear()
+    return ChatService(ClientSource(base_url), cache=ResponseCache(max_size=8, ttl=60), model="stub-model")
+
+
+async def _collect(stream):
+    return "".join([chunk async for chunk in stream])
+
+
+def test_reply_is_cached_by_normalized_query(service):
+    text, cached = asyncio.run(service.reply("How do I squat?"))
+    assert text == "Try this: how do i squat" and not cached
+    text, cached = asyncio.run(service.reply("  how do I   SQUAT "))
+    assert text == "Try this: how do i squat" and cached
+    assert len(CALLS) == 1
+
+
+def test_stream_yields_chunks_and_fills_the_cache(service):
+    text = asyncio.run(_collect(service.stream("neck stretch")))
+    assert text.strip() == "Try this: neck stretch"
+    assert CALLS[-1]["stream"] is True
+    # The streamed reply now answers the same question from the cache
+    assert asyncio.run(service.reply("Neck stretch?")) == (text, True)
+    assert len(CALLS) == 1
+
+
+def test_empty_replies_are_not_cached(service):
+    assert asyncio.run(service.reply("silent please")) == ("", False)
+    assert asyncio.run(service.reply("silent please")) == ("", False)
+    assert asyncio.run(_collect(service.stream("silent stream"))) == ""
+    assert asyncio.run(_collect(service.stream("silent stream"))) == ""
+    assert len(CALLS) == 4
+    assert len(service.cache) == 0
@@ -0,0 +1,98 @@
+"""
+Exercise state machines: python -m pytest backend/test_exercise.py
+"""
+import numpy as np
+
+from exercise import ExerciseEngine, NeckRolls, extract_pose, joint_angles, HIPS, KNEES, ANKLES
+
+
+def front_pose(hip_y, knee_y=0.7, ankles=False):
+    """Front-facing person: hips and knees stacked at the same x, shoulders wide."""
+    pose = np.zeros((17, 3), np.float32)
+    pose[0] = [0.5, hip_y - 0.35, 1.0]                              # Nose
+    pose[5], pose[6] = [0.4, hip_y - 0.25, 1.0], [0.6, hip_y - 0.25, 1.0]  # Shoulders
+    pose[11], pose[12] = [0.45, hip_y, 1.0], [0.55, hip_y, 1.0]      # Hips
+    pose[13], pose[14] = [0.45, knee_y, 1.0], [0.55, knee_y, 1.0]    # Knees
+    if ankles:
+        pose[15], pose[16] = [0.45, knee_y + 0.2, 1.0], [0.55, knee_y + 0.2, 1.0]
+    return pose
+
+
+def side_pose(knee_angle):
+    """Side-on person (shoulders overlap) with ankles visible and the given knee angle."""
+    pose = np.zeros((17, 3), np.float32)
+    knee, ankle = np.array([0.5, 0.7]), np.array([0.5, 0.9])
+    theta = np.radians(180 - knee_angle)
+    hip = knee + 0.2 * np.array([-np.sin(theta), -np.cos(theta)])
+    for i in HIPS:
+        pose[i] = [*hip, 1.0]
+    for i in KNEES:
+        pose[i] = [*knee, 1.0]
+    for i in ANKLES:
+        pose[i] = [*ankle, 1.0]
+    pose[5], pose[6] = [hip[0] - 0.01, hip[1] - 0.25, 1.0], [hip[0] + 0.01, hip[1] - 0.25, 1.0]
+    return pose
+
+
+def run(engine, poses):
+    for t, pose in enumerate(poses):
+        engine.update(pose, now=float(t))
+    return engine.summary()
+
+
+def squats(pose_for, down, up, reps):
+    return [pose_for(value) for _ in range(reps) for value in (up, down)] + [pose_for(up)]
+
+
+def test_front_on_squat_without_ankles_counts_from_hip_drop():
+    summary = run(ExerciseEngine(["squat"]), squats(front_pose, 0.68, 0.5, reps=3))
+    assert summary["count"] == 3 and summary["stage"] == "up"
+
+
+def test_front_on_squat_with_ankles_uses_hip_drop_not_knee_angle():
+    summary = run(ExerciseEngine(["squat"]), squats(lambda y: front_pose(y, ankles=True), 0.68, 0.5, reps=2))
+    assert summary["count"] == 2
+    assert summary["knee_angle"] is None
+
+
+def test_side_on_squat_counts_from_knee_angle():
+    summary = run(ExerciseEngine(["squat"]), squats(side_pose, 80, 175, reps=2))
+    assert summary["count"] == 2
+    assert summary["knee_angle"] > 160
+
+
+def test_half_drop_is_not_a_squat():
+    summary = run(ExerciseEngine(["squat"]), squats(front_pose, 0.58, 0.5, reps=3))
+    assert summary["count"] == 0
+
+
+def test_sit_to_stand_front_on():
+    # Standing first teaches the standing hip height
+    summary = run(ExerciseEngine(["sit_to_stand"]), [front_pose(y) for y in (0.5, 0.66, 0.5, 0.66, 0.5)])
+    assert summary["exercises"]["sit_to_stand"]["count"] == 2
+
+
+def test_knee_angles_do_not_depend_on_aspect_ratio():
+    class Keypoints:
+        def __init__(self, data):
+            self.data = [type("T", (), {"cpu": lambda s: s, "numpy": lambda s: data})()]
+
+        def __len__(self):
+            return 1
+
+    pixels = np.ones((17, 3), np.float32)
+    pixels[HIPS], pixels[KNEES], pixels[ANKLES] = [100, 100, 1], [130, 200, 1], [110, 300, 1]
+    angles = []
+    for shape in [(480, 480), (480, 640), (360, 640)]:
+        result = type("R", (), {"keypoints": Keypoints(pixels.copy()), "boxes": None})()
+        angles.append(joint_angles(extract_pose(result, shape), HIPS, KNEES, ANKLES)[0])
+    assert np.allclose(angles, angles[0])
+
+
+def test_neck_roll_hold_survives_1hz_frames():
+    neck = NeckRolls()
+    pose = front_pose(0.75)
+    pose[0, 1] = pose[5, 1] + 0.02  # Head down: nose at the shoulder line
+    for t in range(6):
+        neck.update(pose, float(t))
+    assert neck.step == 1
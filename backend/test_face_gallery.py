@@ -0,0 +1,95 @@
+"""
+Face gallery matching: python -m pytest backend/test_face_gallery.py
+"""
+import numpy as np
+
+from face_gallery import FaceGallery, MatchCache, face_embedding, EMBED_LANDMARKS, FACE_MATCH_MAX_DISTANCE
+
+SHAPE = (480, 640)  # 4:3 webcam frame
+
+
+def embed(points, shape=SHAPE):
+    return face_embedding(points, shape)
+
+
+def make_face(seed):
+    return np.random.default_rng(seed).uniform(0.35, 0.65, (478, 3)).astype(np.float32)
+
+
+def reshape(face, seed, amount=0.015):
+    """The same face with its rigid landmarks moved (different proportions)."""
+    other = face.copy()
+    other[EMBED_LANDMARKS] += np.random.default_rng(seed).normal(0, amount, (len(EMBED_LANDMARKS), 3))
+    return other
+
+
+def test_single_user_rejects_a_different_face(tmp_path):
+    alice = make_face(0)
+    gallery = FaceGallery(str(tmp_path))
+    gallery.enroll("alice", embed(alice))
+
+    rejected = 0
+    for seed in range(200):
+        user, _, _ = gallery.identify(embed(reshape(alice, seed + 1)))
+        rejected += user is None
+    assert rejected == 200
+
+
+def test_matches_the_same_face_moved_and_scaled(tmp_path):
+    gallery = FaceGallery(str(tmp_path))
+    faces = [make_face(seed) for seed in range(3)]
+    for index, face in enumerate(faces):
+        gallery.enroll(f"user{index}", embed(face))
+
+    jitter = np.random.default_rng(9).normal(0, 0.001, (478, 3)).astype(np.float32)
+    user, _, cached = gallery.identify(embed(faces[1] * 1.4 + 0.1 + jitter))
+    assert user["user_id"] == "user1" and not cached
+
+
+def test_session_cache_rechecks_the_cached_user(tmp_path):
+    alice, bob = make_face(0), make_face(1)
+    gallery = FaceGallery(str(tmp_path))
+    gallery.enroll("alice", embed(alice))
+    gallery.enroll("bob", embed(bob))
+    cache = MatchCache(ttl=60)
+
+    assert gallery.identify(embed(alice), cache)[2] is False
+    user, _, cached = gallery.identify(embed(alice), cache)
+    assert user["user_id"] == "alice" and cached
+    # A different person in front of the kiosk is not let in on the cached match
+    user, _, cached = gallery.identify(embed(bob), cache)
+    assert user["user_id"] == "bob" and not cached
+
+
+def tilt(face, degrees, shape=SHAPE):
+    """The same face rotated in the image plane, in MediaPipe's per-axis normalized coordinates."""
+    height, width = shape
+    pixels = face * np.array([width, height, width], np.float32)
+    center = pixels[:, :2].mean(axis=0)
+    theta = np.radians(degrees)
+    rotation = np.array([[np.cos(theta), -np.sin(theta)], [np.sin(theta), np.cos(theta)]], np.float32)
+    pixels[:, :2] = (pixels[:, :2] - center) @ rotation.T + center
+    return pixels / np.array([width, height, width], np.float32)
+
+
+def test_tilted_head_still_matches(tmp_path):
+    alice = make_face(0)
+    gallery = FaceGallery(str(tmp_path))
+    gallery.enroll("alice", embed(alice))
+    for degrees in (5, 10, 15, -15):
+        user, distance, _ = gallery.identify(embed(tilt(alice, degrees)))
+        assert user is not None and distance < FACE_MATCH_MAX_DISTANCE / 4
+
+
+def test_embedding_does_not_depend_on_aspect_ratio():
+    alice = make_face(0)
+    pixels = alice * np.array([640, 480, 640], np.float32)
+    square = pixels / np.array([800, 800, 800], np.float32)  # Same face in an 800x800 frame
+    assert np.allclose(embed(alice), embed(square, (800, 800)), atol=1e-4)
+
+
+def test_gallery_persists(tmp_path):
+    alice = make_face(0)
+    FaceGallery(str(tmp_path)).enroll("alice", embed(alice), name="Alice")
+    user, _, _ = FaceGallery(str(tmp_path)).identify(embed(alice))
+    assert user["name"] == "Alice"
@@ -0,0 +1,164 @@
+"""
+Background system-volume sampling for /api/health/volume.
+
+A sampler thread reads the output volume at a fixed rate and caches the
+latest reading, so requests never touch the audio APIs. The platform backend
+is pluggable: pycaw (Windows Core Audio over COM) or a fake backend for
+platforms without it and for tests.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+
+# auto = pycaw on Windows, fake elsewhere
+VOLUME_BACKEND = os.getenv("VOLUME_BACKEND", "auto").lower()
+VOLUME_SAMPLE_INTERVAL_S = float(os.getenv("VOLUME_SAMPLE_INTERVAL_S", "1.0"))
+VOLUME_HIGH_PERCENT = int(os.getenv("VOLUME_HIGH_PERCENT", "80"))
+# Re-resolve the default output device this often, so switching to e.g.
+# Bluetooth headphones is picked up
+VOLUME_DEVICE_REFRESH_S = float(os.getenv("VOLUME_DEVICE_REFRESH_S", "5"))
+# Wait between attempts while the backend can't be opened (no audio device yet)
+VOLUME_RETRY_S = float(os.getenv("VOLUME_RETRY_S", "10"))
+
+log = logging.getLogger(__name__)
+
+
+class PycawBackend:
+    """Default audio output device (e.g., Bluetooth, Speakers) through pycaw."""
+    name = "pycaw"
+
+    def __init__(self, refresh=None):
+        self.refresh = VOLUME_DEVICE_REFRESH_S if refresh is None else refresh
+        self._volume = None
+        self._resolved_at = 0.0
+
+    def open(self):
+        # COM is initialized per thread, so this runs on the sampler thread
+        import comtypes
+        comtypes.CoInitialize()
+
+    def _resolve(self):
+        from comtypes import CLSCTX_ALL
+        from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+
+        devices = AudioUtilities.GetDefaultAudioEndpoint(0, 1)  # 0 = eRender, 1 = eMultimedia
+        interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
+        self._volume = interface.QueryInterface(IAudioEndpointVolume)
+        self._resolved_at = time.monotonic()
+
+    def read(self):
+        """(volume_percent, is_bluetooth)"""
+        if self._volume is None or time.monotonic() - self._resolved_at >= self.refresh:
+            self._resolve()
+        try:
+            # Current volume as a scalar (0.0 to 1.0)
+            volume_percent = int(round(self._volume.GetMasterVolumeLevelScalar() * 100))
+        except Exception:
+            self._volume = None  # Device went away, re-resolve on the next read
+            raise
+        # Bluetooth is hard to detect reliably without extra libs, but we provide the field
+        return volume_percent, False
+
+    def close(self):
+        self._volume = None
+        try:
+            import comtypes
+            comtypes.CoUninitialize()
+        except Exception:
+            pass
+
+
+class FakeBackend:
+    """Fixed, settable volume for platforms without pycaw and for tests."""
+    name = "fake"
+
+    def __init__(self, volume=None, is_bluetooth=False):
+        self.volume = int(os.getenv("FAKE_VOLUME", "50")) if volume is None else volume
+        self.is_bluetooth = is_bluetooth
+
+    def open(self):
+        pass
+
+    def read(self):
+        return self.volume, self.is_bluetooth
+
+    def close(self):
+        pass
+
+
+def create_backend(name=None):
+    name = name or VOLUME_BACKEND
+    if name == "auto":
+        name = "pycaw" if sys.platform == "win32" else "fake"
+    if name == "pycaw":
+        return PycawBackend()
+    if name == "fake":
+        return FakeBackend()
+    raise ValueError(f"Unknown volume backend: {name}")
+
+
+class VolumeSampler:
+    def __init__(self, backend=None, interval=None):
+        self.backend = backend or create_backend()
+        self.interval = VOLUME_SAMPLE_INTERVAL_S if interval is None else interval
+        self._reading = {"status": "error", "message": "Volume not sampled yet"}
+        self.sampled_at = None  # time.time() of the cached reading
+        self._stop = threading.Event()
+        self._thread = None
+
+    def latest(self):
+        """Cached reading in the /api/health/volume format."""
+        return self._reading
+
+    def sample(self):
+        """Takes one reading from the backend and caches it."""
+        try:
+            volume_percent, is_bluetooth = self.backend.read()
+            reading = {
+                "volume": volume_percent,
+                "is_high": volume_percent > VOLUME_HIGH_PERCENT,
+                "is_bluetooth": is_bluetooth,
+                "status": "success",
+            }
+            if reading != self._reading:
+                log.info("Health Monitor: Active Audio Device Volume at %d%%", volume_percent)
+        except Exception as e:
+            reading = {"status": "error", "message": str(e)}
+        self._reading = reading
+        self.sampled_at = time.time()
+        return reading
+
+    def _run(self):
+        opened = False
+        try:
+            while not self._stop.is_set():
+                if not opened:
+                    try:
+                        self.backend.open()
+                        opened = True
+                    except Exception as e:
+                        # No audio device yet (e.g. at boot): report it and retry
+                        self._reading = {"status": "error", "message": str(e)}
+                        self.sampled_at = time.time()
+                        log.warning("Health Monitor: %s volume backend unavailable: %s", self.backend.name, e)
+                        self._stop.wait(VOLUME_RETRY_S)
+                        continue
+                self.sample()
+                self._stop.wait(self.interval)
+        finally:
+            if opened:
+                self.backend.close()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="volume-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
@@ -0,0 +1,125 @@
+"""
+Process-pool inference backend.
+
+Optional mode (INFERENCE_WORKERS > 0) that runs MediaPipe and YOLO in a pool
+of worker processes instead of uvicorn's single process, so concurrent
+requests are not serialized on the GIL and on shared model singletons.
+
+Each worker loads its own FaceLandmarker and YOLO models once. The API process
+copies decoded BGR frames into reusable shared-memory segments and only sends
+the segment name and frame shape to the worker.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from face_metrics import landmarks_to_array
+from phone_cadence import result_has_phone
+from exercise import extract_pose, POSE_IMGSZ
+
+# Number of inference worker processes (0 = run models in the API process)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+
+
+# --- Worker side ---
+_face_detector = None
+_pose_model = None
+_object_model = None
+_segments = {}  # Attached shared-memory segments, by name
+
+
+def _init_worker(face_model_path, pose_weights, object_weights):
+    global _face_detector, _pose_model, _object_model
+    from landmarker import create_face_landmarker
+    from models import load_yolo, warm_yolo, warm_face_landmarker
+
+    _face_detector = create_face_landmarker(face_model_path)
+    _pose_model = load_yolo(pose_weights, "pose")
+    _object_model = load_yolo(object_weights, "detect")
+
+    # Pay lazy initialization before the first real frame arrives
+    warm_face_landmarker(_face_detector)
+    warm_yolo(_pose_model)
+    warm_yolo(_object_model)
+
+
+def _attach(name, shape):
+    segment = _segments.get(name)
+    if segment is None:
+        segment = _segments[name] = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=np.uint8, buffer=segment.buf)
+
+
+def _run(task, name, shape):
+    from frames import Frame
+    from landmarker import to_mp_image
+
+    frame = _attach(name, shape)
+    if task == "face":
+        mp_image = to_mp_image(Frame(frame))
+        return [landmarks_to_array(landmarks) for landmarks in _face_detector.detect(mp_image).face_landmarks]
+    if task == "phone":
+        return result_has_phone(_object_model(frame, verbose=False, conf=0.4)[0])
+    if task == "pose":
+        return extract_pose(_pose_model(frame, verbose=False, imgsz=POSE_IMGSZ)[0], frame.shape)
+    raise ValueError(f"Unknown inference task: {task}")
+
+
+# --- API side ---
+class InferencePool:
+    def __init__(self, workers, face_model_path, pose_weights, object_weights):
+        context = multiprocessing.get_context("spawn")
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                            initializer=_init_worker,
+                                            initargs=(face_model_path, pose_weights, object_weights))
+        self._free = []  # Idle shared-memory segments
+        self._all = []
+        self._lock = threading.Lock()
+
+    def _acquire(self, nbytes):
+        with self._lock:
+            for i, segment in enumerate(self._free):
+                if segment.size >= nbytes:
+                    return self._free.pop(i)
+        segment = shared_memory.SharedMemory(create=True, size=nbytes)
+        with self._lock:
+            self._all.append(segment)
+        return segment
+
+    def _release(self, segment):
+        with self._lock:
+            self._free.append(segment)
+
+    def _call(self, task, frame):
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        segment = self._acquire(frame.nbytes)
+        try:
+            np.ndarray(frame.shape, dtype=np.uint8, buffer=segment.buf)[:] = frame
+            return self.executor.submit(_run, task, segment.name, frame.shape).result()
+        finally:
+            self._release(segment)
+
+    def face_landmarks(self, frame):
+        """One (478, 3) float32 landmark array per face found in a BGR frame."""
+        return self._call("face", frame)
+
+    def phone(self, frame):
+        """Whether the object model sees a cell phone in a BGR frame."""
+        return self._call("phone", frame)
+
+    def pose(self, frame):
+        """Normalized (17, 3) keypoints of the most confident person in a BGR frame, or None."""
+        return self._call("pose", frame)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            for segment in self._all:
+                segment.close()
+                segment.unlink()
+            self._all.clear()
+            self._free.clear()
@@ -558,91 +558,130 @@ shortcutModal.onclick = (e) => {
 
 // ------------------- Backend Data -------------------
 
+function renderStatus(data) {
+    if (data.status === "running") {
+        const wellnessCard = document.getElementById("wellnessCard");
+        const remindersSuccess = document.getElementById("remindersSuccessContent");
+        const remindersError = document.getElementById("remindersErrorContent");
+        const faceError = document.getElementById("faceScanError");
+
+        if (wellnessCard) wellnessCard.classList.remove("errorState");
+        if (remindersSuccess) remindersSuccess.classList.remove("hidden");
+        if (remindersError) remindersError.classList.add("hidden");
+        if (faceError) faceError.classList.add("hidden");
+    }
+}
+
+function renderWeather(data) {
+    weatherDataEl.innerHTML = `
+        <div style="font-size:24px">${data.temp}</div>
+        <div>${data.condition}</div>
+    `;
+}
+
+function renderNews(data) {
+    newsDataEl.innerHTML = data.map(n => `<div style="margin-bottom:5px; font-size:12px"><b>${n.source}</b>: ${n.title}</div>`).join("");
+}
+
+// Backend apps are not rendered: renderShortcuts already handles defaults + customs.
+const DASHBOARD_RENDERERS = {
+    status: renderStatus,
+    weather: renderWeather,
+    news: renderNews,
+    volume: data => handleVolumeStatus(data),
+};
+
+function applyDashboardUpdate(update) {
+    for (const [key, value] of Object.entries(update)) {
+        if (DASHBOARD_RENDERERS[key]) DASHBOARD_RENDERERS[key](value);
+    }
+}
+
 async function fetchData() {
+    // GET endpoints send ETags, so unchanged data revalidates as a cheap 304
     try {
-        // Check Backend Status First
-        fetch(`${BACKEND_URL.replace('/api', '')}/api/status`)
+        fetch(`${BACKEND_URL}/status`)
             .then(r => r.json())
-            .then(data => {
-                if (data.status === "running") {
-                    const wellnessCard = document.getElementById("wellnessCard");
-                    const remindersSuccess = document.getElementById("remindersSuccessContent");
-                    const remindersError = document.getElementById("remindersErrorContent");
-                    const faceError = document.getElementById("faceScanError");
-
-                    if (wellnessCard) wellnessCard.classList.remove("errorState");
-                    if (remindersSuccess) remindersSuccess.classList.remove("hidden");
-                    if (remindersError) remindersError.classList.add("hidden");
-                    if (faceError) faceError.classList.add("hidden");
-                }
-            })
+            .then(renderStatus)
             .catch(err => {
                 console.error("Backend status check failed:", err);
             });
 
-        // Weather
-        fetch(`${BACKEND_URL}/weather`)
-            .then(r => r.json())
-            .then(data => {
-                weatherDataEl.innerHTML = `
-                    <div style="font-size:24px">${data.temp}</div>
-                    <div>${data.condition}</div>
-                `;
-            });
-
-        // Apps
-        fetch(`${BACKEND_URL}/apps`)
-            .then(r => r.json())
-            .then(apps => {
-                // If backend provides apps, we can use them as defaults if we want,
-                // but for now let's stick to our local persistence for the "Add Shortcut" feel.
-                // renderShortcuts already handles defaults + customs.
-            });
-
-        // News
-        fetch(`${BACKEND_URL}/news`)
-            .then(r => r.json())
-            .then(data => {
-                newsDataEl.innerHTML = data.map(n => `<div style="margin-bottom:5px; font-size:12px"><b>${n.source}</b>: ${n.title}</div>`).join("");
-            });
+        fetch(`${BACKEND_URL}/weather`).then(r => r.json()).then(renderWeather);
+        fetch(`${BACKEND_URL}/news`).then(r => r.json()).then(renderNews);
 
         // Stocks (Mock)
         stocksDataEl.innerHTML = `
             <div style="color:#0f0">NVDA: $1483.50 (+2.5%)</div>
         `;
-
-
     } catch (e) {
         console.error("Backend error", e);
     }
 }
 
+// Server push: one snapshot, then only the parts that changed.
+// Falls back to polling when EventSource is unavailable.
+let dashboardPolling = null;
+
+function startDashboardPolling() {
+    if (dashboardPolling) return;
+    dashboardPolling = [
+        setInterval(fetchData, 5000), // Keep checking backend status every 5 seconds
+        setInterval(checkVolumeStatus, 5000), // Check volume every 5 seconds for maximum responsiveness
+    ];
+    setTimeout(checkVolumeStatus, 2000); // Initial check after startup
+}
+
+function startDashboardStream() {
+    if (typeof EventSource === "undefined") {
+        startDashboardPolling();
+        return;
+    }
+    const events = new EventSource(`${BACKEND_URL}/events`);
+    events.addEventListener("snapshot", e => applyDashboardUpdate(JSON.parse(e.data)));
+    events.addEventListener("delta", e => applyDashboardUpdate(JSON.parse(e.data)));
+    // EventSource reconnects by itself; the next snapshot resyncs everything
+    events.onerror = () => console.warn("Dashboard stream interrupted, reconnecting...");
+    // Volume only arrives when it changes, so re-check the last reading locally
+    // to keep repeating the reminder while it stays high
+    setInterval(recheckVolumeStatus, 5000);
+}
+
 // ------------------- Volume Monitor -------------------
 let lastVolumeNotificationTime = 0;
 let isVolumeCurrentlyHigh = false; // Track state for instant notification
 const VOLUME_NOTIFICATION_INTERVAL = 2 * 60 * 1000; // Reduced to 2 minutes
+let lastVolumeReading = null;
+
+function handleVolumeStatus(data) {
+    console.log("Volume Check:", data); // Debug log
+    lastVolumeReading = data;
+
+    if (data.status === "success") {
+        if (data.is_high) {
+            const now = Date.now();
+            // Notify if it's the first time it goes high, OR if 15 mins have passed
+            if (!isVolumeCurrentlyHigh || (now - lastVolumeNotificationTime > VOLUME_NOTIFICATION_INTERVAL)) {
+                showVolumeWarning(data.volume);
+                lastVolumeNotificationTime = now;
+            }
+            isVolumeCurrentlyHigh = true;
+        } else {
+            // Volume is low, reset state so it can notify "instantly" next time it goes high
+            isVolumeCurrentlyHigh = false;
+        }
+    }
+}
+
+function recheckVolumeStatus() {
+    if (lastVolumeReading) handleVolumeStatus(lastVolumeReading);
+}
 
 async function checkVolumeStatus() {
     // Broadening check: If we are in the app, we check volume.
     try {
         const res = await fetch(`${BACKEND_URL}/health/volume`);
-        const data = await res.json();
-        console.log("Volume Check:", data); // Debug log
-
-        if (data.status === "success") {
-            if (data.is_high) {
-                const now = Date.now();
-                // Notify if it's the first time it goes high, OR if 15 mins have passed
-                if (!isVolumeCurrentlyHigh || (now - lastVolumeNotificationTime > VOLUME_NOTIFICATION_INTERVAL)) {
-                    showVolumeWarning(data.volume);
-                    lastVolumeNotificationTime = now;
-                }
-                isVolumeCurrentlyHigh = true;
-            } else {
-                // Volume is low, reset state so it can notify "instantly" next time it goes high
-                isVolumeCurrentlyHigh = false;
-            }
-        }
+        handleVolumeStatus(await res.json());
     } catch (e) {
     }
 }
@@ -774,16 +813,23 @@ async function processFrame() {
     canvas.height = videoEl.videoHeight;
     const ctx = canvas.getContext("2d");
     ctx.drawImage(videoEl, 0, 0);
-    const dataUrl = canvas.toDataURL("image/jpeg");
+    // Send raw JPEG bytes (no base64 data URL) to keep the payload small
+    const blob = await new Promise(resolve => canvas.toBlob(resolve, "image/jpeg"));
+    if (!blob) return;
 
     try {
         const res = await fetch(`${BACKEND_URL}/analyze_face`, {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ image: dataUrl })
+            headers: { "Content-Type": "application/octet-stream" },
+            body: blob
         });
+        // Backend at capacity: skip this frame, the next tick sends a fresh one
+        if (res.status === 503) return;
         const data = await res.json();
 
+        // A newer frame replaced this one on the backend, wait for its result
+        if (data.superseded) return;
+
         if (data.detected) {
             // Update UI with specific state
             if (faceScanStatus) {
@@ -907,6 +953,31 @@ function addMessage(text, isUser = false) {
 
     chatMessages.appendChild(messageDiv);
     chatMessages.scrollTop = chatMessages.scrollHeight;
+    return messageDiv;
+}
+
+// Reads a Server-Sent Events response body, calling onEvent(name, data) per event
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let end;
+        while ((end = buffer.indexOf("\n\n")) !== -1) {
+            const block = buffer.slice(0, end);
+            buffer = buffer.slice(end + 2);
+            let name = "message";
+            let data = "";
+            for (const line of block.split("\n")) {
+                if (line.startsWith("event: ")) name = line.slice(7);
+                else if (line.startsWith("data: ")) data += line.slice(6);
+            }
+            if (data) onEvent(name, JSON.parse(data));
+        }
+    }
 }
 
 // Send message
@@ -932,21 +1003,34 @@ async function sendMessage() {
     chatMessages.scrollTop = chatMessages.scrollHeight;
 
     try {
-        // Call backend API
-        const response = await fetch(`${BACKEND_URL}/chat`, {
+        // Call backend API; the reply streams in token by token
+        const response = await fetch(`${BACKEND_URL}/chat/stream`, {
             method: "POST",
             headers: { "Content-Type": "application/json" },
             body: JSON.stringify({ query: message })
         });
+        if (!response.ok) throw new Error(`Chat request failed: ${response.status}`);
+
+        let replyText = null;
+        let reply = "";
+        await readEventStream(response, (event, data) => {
+            if (!replyText) {
+                // Remove typing indicator once the first event arrives
+                const indicator = document.getElementById("typingIndicator");
+                if (indicator) indicator.remove();
+                replyText = addMessage("", false).querySelector(".messageText");
+            }
+            if (event === "token") reply += data.text;
+            else if (event === "done" || event === "error") reply = data.response;
+            replyText.textContent = reply;
+            chatMessages.scrollTop = chatMessages.scrollHeight;
+        });
 
-        const data = await response.json();
-
-        // Remove typing indicator
-        const indicator = document.getElementById("typingIndicator");
-        if (indicator) indicator.remove();
-
-        // Add AI response
-        addMessage(data.response || "I'm here to help! How can I assist you?", false);
+        if (!replyText) {
+            const indicator = document.getElementById("typingIndicator");
+            if (indicator) indicator.remove();
+            addMessage("I'm here to help! How can I assist you?", false);
+        }
 
     } catch (error) {
         console.error("Chat error:", error);
@@ -992,10 +1076,7 @@ document.addEventListener("click", (e) => {
 // Initialize
 renderShortcuts();
 showStartupReminders();
-fetchData();
-setInterval(fetchData, 5000); // Keep checking backend status every 5 seconds
-setInterval(checkVolumeStatus, 5000); // Check volume every 5 seconds for maximum responsiveness
-setTimeout(checkVolumeStatus, 2000); // Initial check after startup
+startDashboardStream();
 
 
 // ------------------- WALLPAPER CUSTOMIZATION -------------------
@@ -6,7 +6,7 @@ import requests
 import sys
 import time
 
-BACKEND_URL = "http://localhost:5000/api"
+BACKEND_URL = "http://localhost:5001/api"
 
 def test_backend():
     print("🔍 Testing Backend Connection...")
@@ -23,8 +23,8 @@ def test_backend():
             print(f"   Status: {data.get('status', 'unknown')}")
             print(f"   Backend: {data.get('backend', 'unknown')}")
             print(f"   Message: {data.get('message', 'N/A')}")
-            if 'face_mesh_ready' in data:
-                print(f"   Face Mesh: {'✅ Ready' if data['face_mesh_ready'] else '❌ Not ready'}")
+            if 'ready' in data:
+                print(f"   Models: {'✅ Ready' if data['ready'] else '⏳ Loading'}")
             print("=" * 60)
             return True
         else:
@@ -50,7 +50,7 @@ if __name__ == "__main__":
     if not success:
         print("💡 Troubleshooting Steps:")
         print("   1. Make sure backend server is running")
-        print("   2. Check if port 5000 is available")
+        print("   2. Check if port 5001 is available")
         print("   3. Verify Python dependencies are installed")
         print("   4. Check backend/server.py for errors")
         print("\n")